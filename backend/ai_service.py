@@ -1,42 +1,171 @@
-import boto3
+from contextlib import aclosing
+from typing import Optional
+from bedrock_limiter import BEDROCK_CLIENT_CONFIG, BedrockError, create_bedrock_limiter
+from metrics import observe_bedrock
+from single_flight import create_single_flight, single_flight_key
+from tracing import activate, bedrock_span, bedrock_stream_span, trace_bedrock_attempt
+import aioboto3
+import asyncio
 import json
 import os
 
 class AIService:
-    def __init__(self, region_name="us-east-1"):
-        self.client = boto3.client(
-            "bedrock-runtime",
-            region_name=region_name,
+    """Bedrock embeddings and Claude text on a non-blocking (aioboto3) client.
+
+    The client is opened lazily on first use, inside the running event loop;
+    call close() on shutdown.
+    """
+    def __init__(self, region_name="us-east-1", embedding_cache=None, response_cache=None, single_flight=None, limiter=None):
+        self.region_name = region_name
+        self.session = aioboto3.Session(
             aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
             aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
         )
+        self._client_context = None
+        self._client_lock = asyncio.Lock()
+        self.client = None
         self.embedding_model = "amazon.titan-embed-text-v2:0"
+        self.embedding_dimensions = 1024
+        self.embedding_cache = embedding_cache
         self.llm_model = "anthropic.claude-3-haiku-20240307-v1:0"
-   
-    def _invoke_model(self, model_id: str, payload: dict) -> dict:
-        try:
-            request = json.dumps(payload)
-            response = self.client.invoke_model(modelId=model_id, body=request)
-            return json.loads(response["body"].read())
-        except Exception as e:
-            print(f"Error invoking model {model_id}: {e}")
-            return {}
-    
-    def generate_embedding(self, text: str) -> list[float]:
-        payload = {"inputText": text}
-        response = self._invoke_model(self.embedding_model, payload)
-        return response.get("embedding", [])
-    
-    def generate_text(self, prompt: str, max_tokens: int = 1000) -> str:
-        payload = {
+        self.response_cache = response_cache  # Opt-in, per call site; see llm_cache.py
+        # Identical concurrent requests share one Bedrock call; see single_flight.py
+        self.single_flight = single_flight if single_flight is not None else create_single_flight()
+        # Per-model rate and AIMD concurrency limits with throttle retries; see bedrock_limiter.py
+        self.limiter = limiter or create_bedrock_limiter()
+    
+    async def _get_client(self):
+        if self.client is None:
+            async with self._client_lock:
+                if self.client is None:
+                    self._client_context = self.session.client("bedrock-runtime", region_name=self.region_name, config=BEDROCK_CLIENT_CONFIG)
+                    self.client = await self._client_context.__aenter__()
+        return self.client
+    
+    async def close(self):
+        if self._client_context is not None:
+            await self._client_context.__aexit__(None, None, None)
+            self._client_context = None
+            self.client = None
+    
+    async def _invoke_model(self, model_id: str, payload: dict) -> dict:
+        """Core method to invoke any Bedrock model; concurrent identical requests are coalesced"""
+        with bedrock_span(model_id, "invoke_model"):
+            if self.single_flight is None:
+                return await self._invoke_model_once(model_id, payload)
+            return await self.single_flight.do(single_flight_key(model_id, payload), lambda: self._invoke_model_once(model_id, payload))
+    
+    async def _invoke_model_once(self, model_id: str, payload: dict) -> dict:
+        """One call under the model's limits; raises BedrockError (BedrockThrottledError once retries run out)"""
+        client = await self._get_client()
+        
+        async def invoke():
+            response = await client.invoke_model(modelId=model_id, body=json.dumps(payload))
+            return json.loads(await response["body"].read())
+        
+        return await self.limiter.call(model_id, self._attempt(model_id, "invoke_model", invoke))
+    
+    def _attempt(self, model_id: str, operation: str, fn):
+        """fn as one observed and traced Bedrock attempt"""
+        return observe_bedrock(model_id, operation, trace_bedrock_attempt(model_id, operation, fn))
+    
+    async def generate_embedding(self, text: str) -> list[float]:
+        if self.embedding_cache:
+            cached = await self.embedding_cache.get(self.embedding_model, self.embedding_dimensions, text)
+            if cached is not None:
+                return cached
+
+        payload = {"inputText": text, "dimensions": self.embedding_dimensions}
+        response = await self._invoke_model(self.embedding_model, payload)
+        embedding = self._response_embedding(response)
+
+        if self.embedding_cache:
+            await self.embedding_cache.put(self.embedding_model, self.embedding_dimensions, text, embedding)
+        return embedding
+    
+    def _response_embedding(self, response: dict) -> list[float]:
+        embedding = response.get("embedding")
+        if not embedding:
+            raise BedrockError(self.embedding_model, "response has no embedding")
+        return embedding
+    
+    def _text_payload(self, prompt: str, max_tokens: int) -> dict:
+        return {
             "anthropic_version": "bedrock-2023-05-31",
             "max_tokens": max_tokens,
             "messages": [
                 {"role": "user", "content": prompt}
             ]
         }
-        response = self._invoke_model(self.llm_model, payload)
+    
+    async def generate_text(self, prompt: str, max_tokens: int = 1000, cache_site: Optional[str] = None) -> str:
+        """Generate text using Claude model; cache_site names the call site for the response cache"""
+        if self._caches(cache_site):
+            cached = await self.response_cache.get(cache_site, self.llm_model, max_tokens, prompt)
+            if cached is not None:
+                return cached
+        
+        payload = self._text_payload(prompt, max_tokens)
+        response = await self._invoke_model(self.llm_model, payload)
         
-        if "content" in response:
+        text = self._response_text(response)
+        if self._caches(cache_site):
+            await self.response_cache.put(cache_site, self.llm_model, max_tokens, prompt, text)
+        return text
+    
+    def _response_text(self, response: dict) -> str:
+        try:
             return response["content"][0]["text"]
-        return ""
+        except (KeyError, IndexError, TypeError):
+            raise BedrockError(self.llm_model, "response has no text content")
+    
+    def _caches(self, cache_site) -> bool:
+        return self.response_cache is not None and self.response_cache.caches(cache_site)
+    
+    async def generate_text_stream(self, prompt: str, max_tokens: int = 1000, cache_site: Optional[str] = None):
+        """Yield text chunks as Claude produces them via Bedrock response streaming.
+
+        Errors are raised as BedrockError, as for generate_text, so a caller
+        that has already started streaming can report them.
+        """
+        if self._caches(cache_site):
+            cached = await self.response_cache.get(cache_site, self.llm_model, max_tokens, prompt)
+            if cached is not None:
+                yield cached
+                return
+        
+        chunks = []
+        async with aclosing(self._stream_chunks(prompt, max_tokens)) as stream:
+            async for text in stream:
+                chunks.append(text)
+                yield text
+        
+        if self._caches(cache_site):
+            await self.response_cache.put(cache_site, self.llm_model, max_tokens, prompt, "".join(chunks))
+    
+    async def _stream_chunks(self, prompt: str, max_tokens: int):
+        payload = self._text_payload(prompt, max_tokens)
+        client = await self._get_client()
+        open_stream = self._attempt(self.llm_model, "invoke_model_with_response_stream", lambda: client.invoke_model_with_response_stream(
+            modelId=self.llm_model, body=json.dumps(payload)
+        ))
+        with bedrock_stream_span(self.llm_model, "invoke_model_with_response_stream") as span:
+            async def open_in_span():
+                with activate(span):
+                    return await open_stream()
+
+            first = True
+            # aclosing gives the limiter's slot back as soon as the caller stops reading
+            async with aclosing(self.limiter.stream(self.llm_model, open_in_span)) as events:
+                async for event in events:
+                    chunk = event.get("chunk")
+                    if not chunk:
+                        continue
+                    data = json.loads(chunk["bytes"])
+                    if data.get("type") == "content_block_delta":
+                        text = data.get("delta", {}).get("text")
+                        if text:
+                            if first:
+                                span.add_event("first_chunk")
+                                first = False
+                            yield text
@@ -1,131 +1,63 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from crud import Database
-from ai_service import AIService
-import json
+"""Temporal backend API: a Quart (ASGI) app served by hypercorn.
 
-app = Flask(__name__)
-CORS(app)
+Every request is a coroutine on top of asyncpg and a non-blocking Bedrock
+client, so one worker can hold hundreds of in-flight LLM-bound requests
+without a thread each. Run with:
 
-class TemporalAPI:
-    def __init__(self):
-        self.db = Database()
-        self.ai_service = AIService()
-    
-    def add_and_process_text(self, text_input, title=None, metadata=None, context_limit=5):
-        try:
-            similar_cards = self.db.vector_search(text_input, limit=context_limit)
-            context_text = self._build_context_from_cards(similar_cards)
-            prompt = self._create_enhanced_prompt(text_input, context_text)
-            ai_response = self.ai_service.generate_text(prompt, max_tokens=1000)
-            card_title = title or self._generate_card_title(ai_response, text_input)
-            card_metadata = metadata or {
-                "type": "knowledge_card",
-                "processed": True,
-                "similar_cards_referenced": len(similar_cards),
-                "original_input_length": len(text_input)
-            }
-            
-            card_id = self.db.add_card(
-                title=card_title,
-                content=ai_response,
-                metadata=card_metadata
-            )
-            
-            return {
-                "success": True,
-                "card_id": card_id,
-                "original_input": text_input,
-                "knowledge_card_content": ai_response,
-                "similar_cards_found": len(similar_cards),
-                "context_used": context_text,
-                "card_title": card_title
-            }
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
-    
-    def _generate_card_title(self, knowledge_card_content, original_input):
-        """Extract title from HTML-formatted knowledge card content"""
-        import re
-        
-        # Try to extract title from <h3 class='card-heading'> tag
-        heading_match = re.search(r"<h3 class='card-heading'>(.*?)</h3>", knowledge_card_content, re.IGNORECASE | re.DOTALL)
-        if heading_match:
-            title = heading_match.group(1).strip()
-            if len(title) > 60:
-                return f"{title[:57]}..."
-            return title
-        
-        # Fallback to original logic
-        lines = knowledge_card_content.split('\n')
-        for line in lines:
-            line = line.strip()
-            if len(line) > 10 and not any(tag in line.lower() for tag in ['<h3', '<h4', '<p', '<div']):
-                if len(line) > 60:
-                    return f"{line[:57]}..."
-                else:
-                    return line
-        
-        return f"Knowledge from: {original_input[:40]}..."
+    hypercorn api:app --bind 0.0.0.0:5000
+"""
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+from knowledge_service import TemporalAPI, card_page_payload, card_payload, parse_ann_args, parse_card_list_args, parse_search_args, search_results_payload
+from llm_cache import llm_cache_stats
+from single_flight import single_flight_stats
+from metrics import instrument_quart, metrics_payload
+from tracing import configure_tracing, trace_quart, traced_stream
+import json
+import os
 
-    def _build_context_from_cards(self, cards):
-        if not cards:
-            return "No similar content found in database."
-        
-        context_parts = []
-        for i, card in enumerate(cards, 1):
-            context_parts.append(f"Context {i}:")
-            context_parts.append(f"Title: {card.title}")
-            context_parts.append(f"Content: {card.content}")
-            context_parts.append("")
-        
-        return "\n".join(context_parts)
-    
-    def _create_enhanced_prompt(self, user_input, context):
-        return f"""You are a knowledge card curator. Your job is to create concise, unique knowledge cards that build upon existing information without repeating it.
+configure_tracing("temporal-backend")
 
-Create a knowledge card that follows this EXACT HTML template structure:
+app = cors(Quart(__name__))
+instrument_quart(app)
+trace_quart(app)
 
-<h3 class='card-heading'>{{Main Topic or Key Concept}}</h3>
-<h4 class='card-subheading'>{{Specific Focus or Application}}</h4>
-<p class='card-description'>{{2-3 sentences explaining the NEW information, insights, or connections not covered in existing cards}}</p>
-<div class='card-insights'>
-<h5>Key Insights:</h5>
-<ul>
-<li>{{Novel insight 1}}</li>
-<li>{{Novel insight 2}}</li>
-<li>{{Novel insight 3 (if applicable)}}</li>
-</ul>
-</div>
-<div class='card-meta'>
-<span class='novelty-indicator'>{{High/Medium/Low}} Novelty</span>
-</div>
+# Initialize API instance; connections are opened in startup()
+temporal_api = TemporalAPI()
 
-Rules:
-1. Extract ONLY NEW information not already covered in existing cards
-2. Focus on what's unique or additive about this input
-3. Keep each insight concise (1 sentence max)
-4. If input largely duplicates existing knowledge, focus only on new nuances
-5. Set novelty as High (completely new), Medium (some new aspects), or Low (minor additions)
+@app.before_serving
+async def startup():
+    await temporal_api.init()
 
-New Input:
-{user_input}
+@app.after_serving
+async def shutdown():
+    await temporal_api.close()
 
-Existing Knowledge in Database:
-{context}
+def wants_stream(data):
+    """Stream when the body sets "stream": true or the client accepts SSE"""
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
 
-Generate the HTML-formatted knowledge card:"""
-# Initialize API instance
-temporal_api = TemporalAPI()
+def sse_response(events):
+    """Serve async (event, data) pairs as Server-Sent Events"""
+    async def generate():
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+    
+    response = Response(
+        traced_stream(generate()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Stop nginx from buffering the stream
+        }
+    )
+    response.timeout = None  # Generation can outlast Quart's default response timeout
+    return response
 
 @app.route('/add-text', methods=['POST'])
-def add_text():
+async def add_text():
     try:
-        data = request.get_json()
+        data = await request.get_json()
         
         if not data or 'text' not in data:
             return jsonify({"error": "Missing 'text' field"}), 400
@@ -134,12 +66,26 @@ def add_text():
         title = data.get('title')
         metadata = data.get('metadata')
         context_limit = data.get('context_limit', 5)
+        try:
+            ann_args = parse_ann_args(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        result = temporal_api.add_and_process_text(
+        if wants_stream(data):
+            return sse_response(temporal_api.stream_and_process_text(
+                text_input=text_input,
+                title=title,
+                metadata=metadata,
+                context_limit=context_limit,
+                **ann_args
+            ))
+        
+        result = await temporal_api.add_and_process_text(
             text_input=text_input,
             title=title,
             metadata=metadata,
-            context_limit=context_limit
+            context_limit=context_limit,
+            **ann_args
         )
         
         if result['success']:
@@ -151,70 +97,187 @@ def add_text():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/knowledge-preview', methods=['POST'])
-def preview_knowledge_card():
+async def preview_knowledge_card():
     """Preview what knowledge card would be created without actually saving it"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         
         if not data or 'text' not in data:
             return jsonify({"error": "Missing 'text' field"}), 400
         
         text_input = data['text']
         context_limit = data.get('context_limit', 5)
+        try:
+            ann_args = parse_ann_args(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        similar_cards = temporal_api.db.vector_search(text_input, limit=context_limit)
-        context_text = temporal_api._build_context_from_cards(similar_cards)
-        prompt = temporal_api._create_enhanced_prompt(text_input, context_text)
-        preview_content = temporal_api.ai_service.generate_text(prompt, max_tokens=1000)
+        if wants_stream(data):
+            return sse_response(temporal_api.stream_preview(
+                text_input,
+                context_limit=context_limit,
+                **ann_args
+            ))
         
-        return jsonify({
-            "success": True,
-            "original_input": text_input,
-            "knowledge_card_preview": preview_content,
-            "similar_cards_count": len(similar_cards),
-            "would_create_card": len(preview_content.strip()) > 50,  # Only create if substantial new content
-            "similar_cards": [
-                {
-                    "id": card.id,
-                    "title": card.title,
-                    "content": card.content[:100] + "..." if len(card.content) > 100 else card.content
-                }
-                for card in similar_cards[:3]  # Show top 3 similar cards
-            ]
-        }), 200
+        result = await temporal_api.preview(
+            text_input,
+            context_limit=context_limit,
+            **ann_args
+        )
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/previews/<token>/commit', methods=['POST'])
+async def commit_preview(token):
+    """Create the card a /knowledge-preview response showed, without regenerating it.
+
+    Body (optional): title and metadata, as for /add-text. Previews expire
+    after PREVIEW_TTL seconds and can be committed once.
+    """
+    try:
+        data = await request.get_json(silent=True) or {}
+        
+        result = await temporal_api.commit_preview(token, title=data.get('title'), metadata=data.get('metadata'))
+        if result is None:
+            return jsonify({
+                "success": False,
+                "error": "Preview not found or expired"
+            }), 404
+        
+        return jsonify(result), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/cards', methods=['GET'])
-def get_all_cards():
+async def list_cards():
+    """List cards one page at a time.
+
+    Query parameters: limit (default 50), cursor (next_cursor of the previous
+    page) and fields (comma-separated subset of id,title,content,metadata,created_at).
+    """
     try:
-        cards = temporal_api.db.get_all_cards()
-        
-        results = []
-        for card in cards:
-            results.append({
-                "id": card.id,
-                "title": card.title,
-                "content": card.content,
-                "metadata": card.card_metadata,
-                "created_at": card.created_at.isoformat()
-            })
+        try:
+            limit, cursor, fields = parse_card_list_args(request.args)
+            cards, next_cursor = await temporal_api.db.list_cards(limit=limit, cursor=cursor, fields=fields)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify(card_page_payload(cards, next_cursor, fields)), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/cards', methods=['POST'])
+async def create_card():
+    """Store a pre-written card as-is: embed and insert, no LLM generation.
+
+    Body: content, plus optional title (derived from the content when
+    missing) and metadata. Use /add-text to have the card written from raw text.
+    """
+    try:
+        data = await request.get_json(silent=True)
+        
+        if not data or not isinstance(data.get('content'), str) or not data['content'].strip():
+            return jsonify({"error": "Missing 'content' field"}), 400
+        
+        result = await temporal_api.add_card(data['content'], title=data.get('title'), metadata=data.get('metadata'))
+        return jsonify(result), 200 if result['success'] else 500
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/search', methods=['POST'])
+async def search_cards():
+    """Nearest cards to a query, with similarity scores.
+
+    Body: query, limit (default 5), card_id (optional card to put first,
+    e.g. the one the user is focused on), ef_search and probes.
+    """
+    try:
+        try:
+            arguments = parse_search_args(await request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        results = await temporal_api.db.search_cards(**arguments)
+        return jsonify(search_results_payload(results)), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/cards/bulk', methods=['POST'])
+async def add_cards_bulk():
+    """Create many cards from pre-written content, embedding them concurrently"""
+    try:
+        data = await request.get_json()
+        
+        if not data or not isinstance(data.get('cards'), list):
+            return jsonify({"error": "Missing 'cards' list"}), 400
+        
+        cards = data['cards']
+        max_items = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+        if len(cards) > max_items:
+            return jsonify({"error": f"Too many cards in one request (max {max_items})"}), 413
+        
+        batch_size = data.get('batch_size', 100)
+        if not isinstance(batch_size, int) or batch_size < 1:
+            return jsonify({"error": "'batch_size' must be a positive integer"}), 400
+        
+        results = await temporal_api.add_cards_bulk(
+            cards,
+            batch_size=min(batch_size, 500),
+            max_workers=int(os.getenv("BULK_EMBED_WORKERS", "8"))
+        )
+        created = sum(1 for result in results if result['success'])
         
         return jsonify({
-            "success": True,
-            "cards": results,
-            "count": len(results)
+            "success": created == len(results),
+            "results": results,
+            "created": created,
+            "failed": len(results) - created
         }), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/embedding-cache/stats', methods=['GET'])
+async def get_embedding_cache_stats():
+    return jsonify({
+        "success": True,
+        "stats": temporal_api.db.embedding_cache.stats()
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Prometheus metrics for this process"""
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
+
+@app.route('/bedrock/stats', methods=['GET'])
+async def get_bedrock_stats():
+    return jsonify({
+        "success": True,
+        "stats": {
+            "single_flight": single_flight_stats(temporal_api.ai_service.single_flight),
+            "limiter": temporal_api.ai_service.limiter.stats()
+        }
+    }), 200
+
+@app.route('/llm-cache/stats', methods=['GET'])
+async def get_llm_cache_stats():
+    return jsonify({
+        "success": True,
+        "stats": llm_cache_stats(temporal_api.ai_service.response_cache)
+    }), 200
+
 @app.route('/cards/<int:card_id>', methods=['DELETE'])
-def delete_card(card_id):
+async def delete_card(card_id):
     try:
         # Check if card exists first
-        card = temporal_api.db.get_card_by_id(card_id)
+        card = await temporal_api.db.get_card_by_id(card_id)
         if not card:
             return jsonify({
                 "success": False,
@@ -222,7 +285,7 @@ def delete_card(card_id):
             }), 404
         
         # Delete the card
-        deleted = temporal_api.db.delete_card(card_id)
+        deleted = await temporal_api.db.delete_card(card_id)
         
         if deleted:
             return jsonify({
@@ -246,9 +309,9 @@ def delete_card(card_id):
         }), 500
 
 @app.route('/cards/<int:card_id>', methods=['PUT'])
-def update_card(card_id):
+async def update_card(card_id):
     try:
-        data = request.get_json()
+        data = await request.get_json()
         
         if not data:
             return jsonify({
@@ -269,19 +332,13 @@ def update_card(card_id):
             }), 400
         
         # Update the card
-        updated_card = temporal_api.db.update_card(card_id, title=title, content=content, metadata=metadata)
+        updated_card = await temporal_api.db.update_card(card_id, title=title, content=content, metadata=metadata)
         
         if updated_card:
             return jsonify({
                 "success": True,
                 "message": f"Card {card_id} updated successfully",
-                "updated_card": {
-                    "id": updated_card.id,
-                    "title": updated_card.title,
-                    "content": updated_card.content,
-                    "metadata": updated_card.card_metadata,
-                    "created_at": updated_card.created_at.isoformat()
-                }
+                "updated_card": card_payload(updated_card)
             }), 200
         else:
             return jsonify({
@@ -296,4 +353,4 @@ def update_card(card_id):
         }), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(host='0.0.0.0', port=5000)
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, Text, JSON, TIMESTAMP
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import Column, Integer, String, Text, JSON, TIMESTAMP
+from sqlalchemy.orm import declarative_base, deferred
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
 
@@ -11,8 +11,35 @@ class Card(Base):
     title = Column(Text)
     content = Column(Text)
     card_metadata = Column(JSON)
-    embedding = Column(Vector(1024))
+    # Deferred: ~4 KB per row that only vector search and updates need
+    embedding = deferred(Column(Vector(1024)))
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     def __repr__(self):
         return f"<Card(id={self.id}, title={self.title}, created_at={self.created_at})>"
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    key = Column(String(64), primary_key=True)  # sha256 of (model id, dimensions, normalized text)
+    model_id = Column(Text, nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    embedding = Column(Vector())
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+    def __repr__(self):
+        return f"<EmbeddingCacheEntry(key={self.key[:12]}, model_id={self.model_id})>"
+
+
+class CardPreview(Base):
+    __tablename__ = "card_previews"
+    token = Column(String(32), primary_key=True)
+    original_input = Column(Text, nullable=False)
+    content = Column(Text, nullable=False)
+    context = Column(Text)
+    similar_card_ids = Column(JSON)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<CardPreview(token={self.token[:8]}, expires_at={self.expires_at})>"
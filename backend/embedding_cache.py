@@ -0,0 +1,165 @@
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from cards import EmbeddingCacheEntry
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry."""
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
+
+
+def embedding_cache_key(model_id: str, dimensions: int, text: str) -> str:
+    """Content address for an embedding: (model id, dimensions, normalized text)."""
+    digest = hashlib.sha256()
+    digest.update(f"{model_id}\x00{dimensions}\x00".encode("utf-8"))
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _upsert_statement(key, model_id, dimensions, embedding):
+    return (
+        insert(EmbeddingCacheEntry)
+        .values(key=key, model_id=model_id, dimensions=dimensions, embedding=embedding)
+        .on_conflict_do_nothing(index_elements=["key"])
+    )
+
+
+def _prune_statements(ttl, max_rows):
+    """DELETEs for persistent entries older than ttl seconds and beyond the newest max_rows (0 disables each)"""
+    statements = []
+    if ttl > 0:
+        statements.append(
+            delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.created_at < func.now() - timedelta(seconds=ttl))
+        )
+    if max_rows > 0:
+        # created_at of the oldest entry within the cap; NULL (nothing deleted) while under it
+        cutoff = (
+            select(EmbeddingCacheEntry.created_at)
+            .order_by(EmbeddingCacheEntry.created_at.desc())
+            .offset(max_rows - 1)
+            .limit(1)
+            .scalar_subquery()
+        )
+        statements.append(delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.created_at < cutoff))
+    return statements
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: an in-process LRU in front of a Postgres table.
+
+    The persistent tier goes through an async_sessionmaker and is optional;
+    pass session_factory=None to run memory-only. Its entries expire after ttl
+    seconds and it keeps at most max_rows of them; both are enforced by a
+    prune that runs after a store, at most once every prune_interval seconds.
+    """
+
+    def __init__(self, session_factory=None, max_entries=10000, ttl=0, max_rows=0, prune_interval=60):
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._prune_statements = _prune_statements(ttl, max_rows)
+        self.prune_interval = prune_interval
+        self._last_prune = None
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.persistent_pruned = 0
+
+    async def get(self, model_id: str, dimensions: int, text: str):
+        key = embedding_cache_key(model_id, dimensions, text)
+        embedding = self._memory_get(key)
+        if embedding is not None:
+            return embedding
+        return self._loaded(key, await self._load(key))
+
+    async def put(self, model_id: str, dimensions: int, text: str, embedding: list[float]) -> None:
+        if not embedding:
+            return
+
+        key = embedding_cache_key(model_id, dimensions, text)
+        self._remember(key, embedding)
+        await self._store(key, model_id, dimensions, embedding)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        hits = self.memory_hits + self.persistent_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._entries),
+            "memory_capacity": self.max_entries,
+            "persistent_enabled": self.session_factory is not None,
+            "persistent_pruned": self.persistent_pruned
+        }
+
+    def _memory_get(self, key: str):
+        embedding = self._entries.get(key)
+        if embedding is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+        return embedding
+
+    def _loaded(self, key: str, embedding):
+        """Record the outcome of a persistent-tier lookup."""
+        if embedding is None:
+            self.misses += 1
+            return None
+        self.persistent_hits += 1
+        self._remember(key, embedding)
+        return embedding
+
+    def _remember(self, key: str, embedding: list[float]) -> None:
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: str):
+        if self.session_factory is None:
+            return None
+
+        async with self.session_factory() as session:
+            try:
+                entry = await session.get(EmbeddingCacheEntry, key)
+                if entry is None:
+                    return None
+                return [float(value) for value in entry.embedding]
+            except Exception as e:
+                print(f"Error reading embedding cache: {e}")
+                return None
+
+    async def _store(self, key: str, model_id: str, dimensions: int, embedding: list[float]) -> None:
+        if self.session_factory is None:
+            return
+
+        async with self.session_factory() as session:
+            try:
+                await session.execute(_upsert_statement(key, model_id, dimensions, embedding))
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                print(f"Error writing embedding cache: {e}")
+                return
+            await self._prune(session)
+
+    async def _prune(self, session) -> None:
+        now = time.monotonic()
+        if not self._prune_statements or (self._last_prune is not None and now - self._last_prune < self.prune_interval):
+            return
+        self._last_prune = now
+        try:
+            for statement in self._prune_statements:
+                self.persistent_pruned += (await session.execute(statement)).rowcount
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            print(f"Error pruning embedding cache: {e}")
@@ -0,0 +1,386 @@
+from crud import Database, CARD_LIST_FIELDS, MAX_EF_SEARCH
+import os
+
+def parse_card_list_args(args):
+    """Validate /cards query parameters; returns (limit, cursor, fields) or raises ValueError"""
+    max_limit = int(os.getenv("CARDS_PAGE_MAX", "500"))
+    limit = args.get('limit', 50, type=int)
+    if limit is None or limit < 1 or limit > max_limit:
+        raise ValueError(f"'limit' must be between 1 and {max_limit}")
+    
+    fields = None
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in CARD_LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    
+    return limit, args.get('cursor'), fields
+
+def card_page_payload(cards, next_cursor, fields=None):
+    """Serialize a page of list_cards rows for the /cards response"""
+    output_fields = fields or list(CARD_LIST_FIELDS)
+    results = []
+    for card in cards:
+        result = {"id": card.id}
+        for field in output_fields:
+            value = getattr(card, field)
+            result[field] = value.isoformat() if field == "created_at" else value
+        results.append(result)
+    
+    return {
+        "success": True,
+        "cards": results,
+        "count": len(results),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
+
+def parse_ann_args(data):
+    """Validate the optional ef_search and probes recall overrides; returns them as keyword arguments or raises ValueError"""
+    ef_search = data.get('ef_search')
+    if ef_search is not None and (not isinstance(ef_search, int) or ef_search < 1 or ef_search > MAX_EF_SEARCH):
+        raise ValueError(f"'ef_search' must be between 1 and {MAX_EF_SEARCH}")
+    
+    probes = data.get('probes')
+    if probes is not None and (not isinstance(probes, int) or probes < 1):
+        raise ValueError("'probes' must be a positive integer")
+    
+    return {"ef_search": ef_search, "probes": probes}
+
+def parse_search_args(data):
+    """Validate a /search body; returns search_cards keyword arguments or raises ValueError"""
+    query = data.get('query') if data else None
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("Missing 'query' field")
+    
+    max_limit = int(os.getenv("SEARCH_MAX_LIMIT", "50"))
+    limit = data.get('limit', 5)
+    if not isinstance(limit, int) or limit < 1 or limit > max_limit:
+        raise ValueError(f"'limit' must be between 1 and {max_limit}")
+    
+    seed_card_id = data.get('card_id')
+    if seed_card_id is not None and not isinstance(seed_card_id, int):
+        raise ValueError("'card_id' must be an integer")
+    
+    return {
+        "query_text": query,
+        "limit": limit,
+        "seed_card_id": seed_card_id,
+        **parse_ann_args(data)
+    }
+
+def search_results_payload(results):
+    """Serialize search_cards (card, score) pairs for the /search response"""
+    cards = [{**card_payload(card), "score": score} for card, score in results]
+    return {
+        "success": True,
+        "cards": cards,
+        "count": len(cards)
+    }
+
+def card_payload(card):
+    return {
+        "id": card.id,
+        "title": card.title,
+        "content": card.content,
+        "metadata": card.card_metadata,
+        "created_at": card.created_at.isoformat()
+    }
+
+class TemporalAPI:
+    """Card generation on top of Database and Bedrock; call init() inside the event loop first"""
+    def __init__(self):
+        self.db = Database()
+        self.ai_service = self.db.ai_service
+        self.preview_ttl = int(os.getenv("PREVIEW_TTL", "900"))
+    
+    async def init(self):
+        await self.db.init()
+    
+    async def close(self):
+        await self.db.close()
+    
+    async def add_and_process_text(self, text_input, title=None, metadata=None, context_limit=5,
+                                   ef_search=None, probes=None):
+        try:
+            similar_cards = await self.db.vector_search(
+                text_input, limit=context_limit, ef_search=ef_search, probes=probes
+            )
+            context_text = self._build_context_from_cards(similar_cards)
+            prompt = self._create_enhanced_prompt(text_input, context_text)
+            ai_response = await self.ai_service.generate_text(prompt, max_tokens=1000, cache_site="knowledge_card")
+            return await self._save_knowledge_card(text_input, ai_response, similar_cards, context_text, title, metadata)
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def stream_and_process_text(self, text_input, title=None, metadata=None, context_limit=5,
+                                      ef_search=None, probes=None):
+        """Streaming variant of add_and_process_text.
+        
+        Yields (event, data) pairs: "context" as soon as retrieval finishes, one
+        "token" per generated chunk, then "done" with the add_and_process_text
+        result once the card is persisted. Failures end the stream with "error".
+        """
+        try:
+            similar_cards = await self.db.vector_search(
+                text_input, limit=context_limit, ef_search=ef_search, probes=probes
+            )
+            context_text = self._build_context_from_cards(similar_cards)
+            yield "context", {
+                "similar_cards_found": len(similar_cards),
+                "context_used": context_text,
+                "similar_cards": self._summarize_similar_cards(similar_cards)
+            }
+            
+            prompt = self._create_enhanced_prompt(text_input, context_text)
+            chunks = []
+            async for chunk in self.ai_service.generate_text_stream(prompt, max_tokens=1000, cache_site="knowledge_card"):
+                chunks.append(chunk)
+                yield "token", {"text": chunk}
+            
+            ai_response = "".join(chunks)
+            yield "done", await self._save_knowledge_card(text_input, ai_response, similar_cards, context_text, title, metadata)
+            
+        except Exception as e:
+            yield "error", {
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def preview(self, text_input, context_limit=5, ef_search=None, probes=None):
+        """Generate a knowledge card without creating it.
+        
+        The preview is kept for preview_ttl seconds under the returned
+        preview_token; commit_preview stores it as a card without regenerating.
+        """
+        similar_cards = await self.db.vector_search(
+            text_input, limit=context_limit, ef_search=ef_search, probes=probes
+        )
+        context_text = self._build_context_from_cards(similar_cards)
+        prompt = self._create_enhanced_prompt(text_input, context_text)
+        preview_content = await self.ai_service.generate_text(prompt, max_tokens=1000, cache_site="knowledge_card")
+        stored = await self._store_preview(text_input, preview_content, context_text, similar_cards)
+        return self._preview_result(text_input, preview_content, similar_cards, stored)
+    
+    async def commit_preview(self, token, title=None, metadata=None):
+        """Create the card a preview showed; None if the token is unknown, expired or already used"""
+        committed = await self.db.commit_preview(token, lambda preview: self._preview_card_fields(preview, title, metadata))
+        return self._committed_preview_result(token, committed, title)
+    
+    async def stream_preview(self, text_input, context_limit=5, ef_search=None, probes=None):
+        """Stream a knowledge card preview as (event, data) pairs without saving it"""
+        try:
+            similar_cards = await self.db.vector_search(
+                text_input, limit=context_limit, ef_search=ef_search, probes=probes
+            )
+            context_text = self._build_context_from_cards(similar_cards)
+            yield "context", {
+                "similar_cards_count": len(similar_cards),
+                "similar_cards": self._summarize_similar_cards(similar_cards)
+            }
+            
+            prompt = self._create_enhanced_prompt(text_input, context_text)
+            chunks = []
+            async for chunk in self.ai_service.generate_text_stream(prompt, max_tokens=1000, cache_site="knowledge_card"):
+                chunks.append(chunk)
+                yield "token", {"text": chunk}
+            
+            preview_content = "".join(chunks)
+            stored = await self._store_preview(text_input, preview_content, context_text, similar_cards)
+            yield "done", self._preview_result(text_input, preview_content, similar_cards, stored)
+            
+        except Exception as e:
+            yield "error", {
+                "success": False,
+                "error": str(e)
+            }
+    
+    async def _store_preview(self, text_input, preview_content, context_text, similar_cards):
+        """(token, expires_at) for a stored preview; None if storing failed, which only costs the commit"""
+        try:
+            return await self.db.save_preview(text_input, preview_content, context_text, [card.id for card in similar_cards], self.preview_ttl)
+        except Exception as e:
+            print(f"Error storing preview: {e}")
+            return None
+    
+    def _preview_result(self, text_input, preview_content, similar_cards, stored):
+        token, expires_at = stored or (None, None)
+        return {
+            "success": True,
+            "original_input": text_input,
+            "knowledge_card_preview": preview_content,
+            "similar_cards_count": len(similar_cards),
+            "would_create_card": len(preview_content.strip()) > 50,  # Only create if substantial new content
+            "similar_cards": self._summarize_similar_cards(similar_cards),  # Show top 3 similar cards
+            "preview_token": token,
+            "expires_at": expires_at.isoformat() if expires_at else None
+        }
+    
+    def _preview_card_fields(self, preview, title=None, metadata=None):
+        return self._knowledge_card_fields(
+            preview["original_input"], preview["content"], preview["similar_card_ids"], title, metadata
+        )
+    
+    def _committed_preview_result(self, token, committed, title=None):
+        if committed is None:
+            return None
+        card_id, preview = committed
+        card_title = title or self._generate_card_title(preview["content"], preview["original_input"])
+        result = self._knowledge_card_result(
+            card_id, preview["original_input"], preview["content"], preview["similar_card_ids"], preview["context"], card_title
+        )
+        result["preview_token"] = token
+        return result
+    
+    async def add_card(self, content, title=None, metadata=None):
+        """Store a card whose content the caller already wrote: one embedding, no generation"""
+        try:
+            card_title, card_metadata = self._direct_card_fields(content, title, metadata)
+            card_id = await self.db.add_card(title=card_title, content=content, metadata=card_metadata)
+            return self._direct_card_result(card_id, content, card_title)
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def _direct_card_fields(self, content, title=None, metadata=None):
+        card_title = title or self._generate_card_title(content, content)
+        card_metadata = metadata or {
+            "type": "knowledge_card",
+            "processed": False
+        }
+        return card_title, card_metadata
+    
+    def _direct_card_result(self, card_id, content, card_title):
+        return {
+            "success": True,
+            "card_id": card_id,
+            "knowledge_card_content": content,
+            "card_title": card_title
+        }
+    
+    async def _save_knowledge_card(self, text_input, ai_response, similar_cards, context_text, title=None, metadata=None):
+        card_title, card_metadata = self._knowledge_card_fields(text_input, ai_response, similar_cards, title, metadata)
+        card_id = await self.db.add_card(
+            title=card_title,
+            content=ai_response,
+            metadata=card_metadata
+        )
+        return self._knowledge_card_result(card_id, text_input, ai_response, similar_cards, context_text, card_title)
+    
+    def _knowledge_card_fields(self, text_input, ai_response, similar_cards, title=None, metadata=None):
+        card_title = title or self._generate_card_title(ai_response, text_input)
+        card_metadata = metadata or {
+            "type": "knowledge_card",
+            "processed": True,
+            "similar_cards_referenced": len(similar_cards),
+            "original_input_length": len(text_input)
+        }
+        return card_title, card_metadata
+    
+    def _knowledge_card_result(self, card_id, text_input, ai_response, similar_cards, context_text, card_title):
+        return {
+            "success": True,
+            "card_id": card_id,
+            "original_input": text_input,
+            "knowledge_card_content": ai_response,
+            "similar_cards_found": len(similar_cards),
+            "context_used": context_text,
+            "card_title": card_title
+        }
+    
+    async def add_cards_bulk(self, cards, batch_size=100, max_workers=8):
+        """Database.add_cards_bulk, deriving a title from the content of items that have none"""
+        for card in cards:
+            if isinstance(card, dict) and isinstance(card.get('content'), str) and card['content'] and not card.get('title'):
+                card['title'] = self._generate_card_title(card['content'], card['content'])
+        return await self.db.add_cards_bulk(cards, batch_size=batch_size, max_workers=max_workers)
+    
+    def _summarize_similar_cards(self, cards, limit=3):
+        return [
+            {
+                "id": card.id,
+                "title": card.title,
+                "content": card.content[:100] + "..." if len(card.content) > 100 else card.content
+            }
+            for card in cards[:limit]
+        ]
+    
+    def _generate_card_title(self, knowledge_card_content, original_input):
+        """Extract title from HTML-formatted knowledge card content"""
+        import re
+        
+        # Try to extract title from <h3 class='card-heading'> tag
+        heading_match = re.search(r"<h3 class='card-heading'>(.*?)</h3>", knowledge_card_content, re.IGNORECASE | re.DOTALL)
+        if heading_match:
+            title = heading_match.group(1).strip()
+            if len(title) > 60:
+                return f"{title[:57]}..."
+            return title
+        
+        # Fallback to original logic
+        lines = knowledge_card_content.split('\n')
+        for line in lines:
+            line = line.strip()
+            if len(line) > 10 and not any(tag in line.lower() for tag in ['<h3', '<h4', '<p', '<div']):
+                if len(line) > 60:
+                    return f"{line[:57]}..."
+                else:
+                    return line
+        
+        return f"Knowledge from: {original_input[:40]}..."
+
+    def _build_context_from_cards(self, cards):
+        if not cards:
+            return "No similar content found in database."
+        
+        context_parts = []
+        for i, card in enumerate(cards, 1):
+            context_parts.append(f"Context {i}:")
+            context_parts.append(f"Title: {card.title}")
+            context_parts.append(f"Content: {card.content}")
+            context_parts.append("")
+        
+        return "\n".join(context_parts)
+    
+    def _create_enhanced_prompt(self, user_input, context):
+        return f"""You are a knowledge card curator. Your job is to create concise, unique knowledge cards that build upon existing information without repeating it.
+
+Create a knowledge card that follows this EXACT HTML template structure:
+
+<h3 class='card-heading'>{{Main Topic or Key Concept}}</h3>
+<h4 class='card-subheading'>{{Specific Focus or Application}}</h4>
+<p class='card-description'>{{2-3 sentences explaining the NEW information, insights, or connections not covered in existing cards}}</p>
+<div class='card-insights'>
+<h5>Key Insights:</h5>
+<ul>
+<li>{{Novel insight 1}}</li>
+<li>{{Novel insight 2}}</li>
+<li>{{Novel insight 3 (if applicable)}}</li>
+</ul>
+</div>
+<div class='card-meta'>
+<span class='novelty-indicator'>{{High/Medium/Low}} Novelty</span>
+</div>
+
+Rules:
+1. Extract ONLY NEW information not already covered in existing cards
+2. Focus on what's unique or additive about this input
+3. Keep each insight concise (1 sentence max)
+4. If input largely duplicates existing knowledge, focus only on new nuances
+5. Set novelty as High (completely new), Medium (some new aspects), or Low (minor additions)
+
+New Input:
+{user_input}
+
+Existing Knowledge in Database:
+{context}
+
+Generate the HTML-formatted knowledge card:"""
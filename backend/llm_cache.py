@@ -0,0 +1,145 @@
+"""Opt-in Redis cache for Claude text responses.
+
+Entries are keyed by (model, max_tokens, prompt hash) and expire after a TTL
+chosen per call site. A sorted-set index caps how many entries are kept. Only
+the call sites named in LLM_CACHE_SITES are cached, because most prompts embed
+user text and never repeat.
+"""
+from collections import defaultdict
+from typing import Optional
+import hashlib
+import os
+import time
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Only needed when LLM_CACHE is enabled
+    aioredis = None
+
+KEY_PREFIX = "llm_cache:"
+INDEX_KEY = "llm_cache:index"  # Sorted set: entry key scored by store time
+
+
+def llm_cache_key(model_id: str, max_tokens: int, prompt: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{model_id}\x00{max_tokens}\x00".encode("utf-8"))
+    digest.update(prompt.encode("utf-8"))
+    return KEY_PREFIX + digest.hexdigest()
+
+
+def parse_cache_sites(spec: str, default_ttl: int) -> dict:
+    """ "intent:600,response" -> {"intent": 600, "response": default_ttl} """
+    sites = {}
+    for item in spec.split(","):
+        name, _, ttl = item.strip().partition(":")
+        if name:
+            sites[name] = int(ttl) if ttl else default_ttl
+    return sites
+
+
+class LLMResponseCache:
+    """Response cache on a redis.asyncio client; errors are logged and treated as misses"""
+
+    def __init__(self, client, sites: dict, max_entries: int = 10000, max_response_bytes: int = 16384):
+        self.client = client
+        self.sites = sites
+        self.max_entries = max_entries
+        self.max_response_bytes = max_response_bytes
+        self._counts = defaultdict(lambda: {"hits": 0, "misses": 0, "stores": 0, "skipped": 0})
+
+    def caches(self, site: Optional[str]) -> bool:
+        return site in self.sites
+
+    async def get(self, site: str, model_id: str, max_tokens: int, prompt: str) -> Optional[str]:
+        try:
+            response = await self.client.get(llm_cache_key(model_id, max_tokens, prompt))
+        except Exception as e:
+            print(f"Error reading LLM cache: {e}")
+            response = None
+        self._count(site, "hits" if response is not None else "misses")
+        return response
+
+    async def put(self, site: str, model_id: str, max_tokens: int, prompt: str, response: str) -> None:
+        if not self._storable(site, response):
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            self._queue_put(pipe, site, llm_cache_key(model_id, max_tokens, prompt), response)
+            size = (await pipe.execute())[-1]
+            if size > self.max_entries:
+                oldest = await self.client.zrange(INDEX_KEY, 0, size - self.max_entries - 1)
+                self._queue_evict(pipe, oldest)
+                await pipe.execute()
+            self._count(site, "stores")
+        except Exception as e:
+            print(f"Error writing LLM cache: {e}")
+
+    def stats(self) -> dict:
+        sites = {site: dict(counts) for site, counts in self._counts.items()}
+        for counts in sites.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+
+        hits = sum(counts["hits"] for counts in sites.values())
+        lookups = hits + sum(counts["misses"] for counts in sites.values())
+        return {
+            "enabled": True,
+            "sites": sites,
+            "ttls": self.sites,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "max_entries": self.max_entries
+        }
+
+    def _storable(self, site: str, response: str) -> bool:
+        # Empty means the call failed; oversized replies would crowd out many small ones
+        if not response:
+            return False
+        if len(response.encode("utf-8")) > self.max_response_bytes:
+            self._count(site, "skipped")
+            return False
+        return True
+
+    def _queue_put(self, pipe, site: str, key: str, response: str) -> None:
+        pipe.set(key, response, ex=self.sites[site])
+        pipe.zadd(INDEX_KEY, {key: time.time()})
+        pipe.zcard(INDEX_KEY)
+
+    def _queue_evict(self, pipe, keys: list) -> None:
+        if keys:
+            pipe.delete(*keys)
+            pipe.zrem(INDEX_KEY, *keys)
+
+    def _count(self, site: str, outcome: str) -> None:
+        self._counts[site][outcome] += 1
+
+
+def llm_cache_stats(cache: Optional[LLMResponseCache]) -> dict:
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+def llm_cache_settings() -> Optional[dict]:
+    """Cache settings from LLM_CACHE_* environment variables; None unless LLM_CACHE=true"""
+    if os.getenv("LLM_CACHE", "false").lower() != "true":
+        return None
+    return {
+        "sites": parse_cache_sites(os.getenv("LLM_CACHE_SITES", "intent,response,knowledge_card"), int(os.getenv("LLM_CACHE_TTL", "3600"))),
+        "max_entries": int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+        "max_response_bytes": int(os.getenv("LLM_CACHE_MAX_RESPONSE_BYTES", "16384"))
+    }
+
+
+def create_llm_cache(client=None) -> Optional[LLMResponseCache]:
+    """Build the cache on client, or on LLM_CACHE_REDIS_URL when no client is given"""
+    settings = llm_cache_settings()
+    if settings is None:
+        return None
+    if client is None:
+        url = os.getenv("LLM_CACHE_REDIS_URL")
+        if not url or aioredis is None:
+            print("⚠ LLM_CACHE is enabled but LLM_CACHE_REDIS_URL is not set; responses won't be cached")
+            return None
+        client = aioredis.Redis.from_url(url, decode_responses=True)
+    print(f"✓ LLM response cache enabled for: {', '.join(settings['sites'])}")
+    return LLMResponseCache(client, **settings)
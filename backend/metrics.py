@@ -0,0 +1,146 @@
+"""Prometheus metrics for the backend, served at GET /metrics.
+
+Covers request latency per route, Bedrock calls by model, and SQL statements
+issued through Database, each with an in-flight gauge and an
+error counter.
+"""
+from contextlib import contextmanager
+import re
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+
+from bedrock_limiter import error_code
+
+# Bedrock calls and whole requests run for seconds; keep resolution up to a minute
+SLOW_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route",
+    ["method", "route", "status"], buckets=SLOW_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled, by route", ["method", "route"])
+HTTP_ERRORS = Counter("http_request_errors_total", "Responses with a 5xx status, by route", ["method", "route", "status"])
+
+BEDROCK_DURATION = Histogram(
+    "bedrock_request_duration_seconds", "Bedrock call latency per attempt, by model",
+    ["model", "operation"], buckets=SLOW_BUCKETS
+)
+BEDROCK_IN_FLIGHT = Gauge("bedrock_requests_in_flight", "Bedrock calls awaiting a reply, by model", ["model"])
+BEDROCK_ERRORS = Counter("bedrock_errors_total", "Failed Bedrock attempts, by model and error code", ["model", "code"])
+
+
+def metrics_payload() -> tuple:
+    """(body, content type) for GET /metrics"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def _route(request) -> str:
+    # The URL rule, not the path, so /cards/<int:card_id> is one series
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _request_started(request, g) -> None:
+    g.metrics_route = _route(request)
+    g.metrics_started = time.perf_counter()
+    HTTP_IN_FLIGHT.labels(request.method, g.metrics_route).inc()
+
+
+def _request_finished(request, g, response):
+    started = getattr(g, "metrics_started", None)
+    if started is not None:
+        status = str(response.status_code)
+        HTTP_DURATION.labels(request.method, g.metrics_route, status).observe(time.perf_counter() - started)
+        if response.status_code >= 500:
+            HTTP_ERRORS.labels(request.method, g.metrics_route, status).inc()
+    return response
+
+
+def _request_torn_down(request, g) -> None:
+    if getattr(g, "metrics_started", None) is not None:
+        HTTP_IN_FLIGHT.labels(request.method, g.metrics_route).dec()
+
+
+def instrument_quart(app) -> None:
+    """Record latency, in-flight count and 5xx responses for every Quart route.
+
+    Streamed (SSE) responses are timed to their first byte, when the view returns.
+    """
+    from quart import g, request
+
+    @app.before_request
+    async def metrics_request_started():
+        _request_started(request, g)
+
+    @app.after_request
+    async def metrics_request_finished(response):
+        return _request_finished(request, g, response)
+
+    @app.teardown_request
+    async def metrics_request_torn_down(error):
+        _request_torn_down(request, g)
+
+
+@contextmanager
+def _bedrock_timer(model_id: str, operation: str):
+    BEDROCK_IN_FLIGHT.labels(model_id).inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        BEDROCK_ERRORS.labels(model_id, error_code(e) or type(e).__name__).inc()
+        raise
+    finally:
+        BEDROCK_DURATION.labels(model_id, operation).observe(time.perf_counter() - started)
+        BEDROCK_IN_FLIGHT.labels(model_id).dec()
+
+
+def observe_bedrock(model_id: str, operation: str, fn):
+    """Coroutine function fn, timed as one Bedrock attempt; wrap inside the limiter so each retry is observed"""
+    async def observed():
+        with _bedrock_timer(model_id, operation):
+            return await fn()
+    return observed
+
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+SQL_DURATION = Histogram(
+    "db_statement_duration_seconds", "SQL statement latency, by operation and table",
+    ["operation", "table"], buckets=FAST_BUCKETS
+)
+SQL_IN_FLIGHT = Gauge("db_statements_in_flight", "SQL statements executing")
+SQL_ERRORS = Counter("db_statement_errors_total", "Failed SQL statements, by operation and table", ["operation", "table"])
+
+SQL_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?\"?(\w+)", re.IGNORECASE)
+
+
+def sql_labels(statement: str) -> tuple:
+    """(operation, table) for a statement, e.g. ("SELECT", "cards"); table is "" when there is none"""
+    words = statement.split(None, 1)
+    operation = words[0].upper() if words else ""
+    match = SQL_TABLE_PATTERN.search(statement)
+    return operation, match.group(1) if match else ""
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement the engine executes. For an AsyncEngine, pass engine.sync_engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def metrics_statement_started(conn, cursor, statement, parameters, context, executemany):
+        context.metrics_labels = sql_labels(statement)
+        context.metrics_started = time.perf_counter()
+        SQL_IN_FLIGHT.inc()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def metrics_statement_finished(conn, cursor, statement, parameters, context, executemany):
+        SQL_DURATION.labels(*context.metrics_labels).observe(time.perf_counter() - context.metrics_started)
+        SQL_IN_FLIGHT.dec()
+
+    @event.listens_for(engine, "handle_error")
+    def metrics_statement_failed(exception_context):
+        context = exception_context.execution_context
+        if context is not None and getattr(context, "metrics_started", None) is not None:
+            SQL_ERRORS.labels(*context.metrics_labels).inc()
+            SQL_IN_FLIGHT.dec()
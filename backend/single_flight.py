@@ -0,0 +1,186 @@
+"""Single-flight coalescing of identical Bedrock requests.
+
+Concurrent calls with the same model id and request body share one upstream
+call. The first caller leads and the others wait for its result. With a Redis
+client (BEDROCK_SINGLE_FLIGHT_REDIS=true), leaders also take a short Redis
+lock, so callers in other processes wait for the leader's result. They read
+it from Redis instead of calling Bedrock themselves. A result published
+in the last few seconds is reused by a caller that arrives after the leader
+finished. A follower whose leader vanishes (lock expired, no result) or
+takes longer than the lock TTL makes the call itself.
+"""
+from typing import Optional
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Only needed for cross-process coalescing
+    aioredis = None
+
+LOCK_PREFIX = "single_flight:lock:"
+RESULT_PREFIX = "single_flight:result:"
+
+
+def single_flight_key(model_id: str, payload: dict) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{model_id}\x00{body}".encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Task-level coalescing on one event loop, plus cross-process coalescing when given a redis.asyncio client.
+
+    do() takes a coroutine function and is a coroutine.
+    """
+
+    def __init__(self, client=None, lock_ttl: float = 30, result_ttl: float = 10, poll_interval: float = 0.05):
+        self.client = client
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._counts = {"leaders": 0, "followers": 0, "remote_followers": 0, "remote_fallbacks": 0, "local_fallbacks": 0}
+
+    async def do(self, key: str, fn):
+        """Return await fn(), sharing one execution among concurrent callers with the same key"""
+        task = self._calls.get(key)
+        if task is None:
+            # A separate task, so a cancelled caller doesn't cancel the call for everyone else
+            task = self._calls[key] = asyncio.ensure_future(self._lead(key, fn))
+            task.add_done_callback(lambda done: self._forget(key, done))
+            return await asyncio.shield(task)
+
+        self._count("followers")
+        try:
+            # As long as a remote follower would wait; a stuck leader must not hold its followers forever
+            return await asyncio.wait_for(asyncio.shield(task), self.lock_ttl)
+        except asyncio.TimeoutError:
+            self._count("local_fallbacks")
+            return await fn()
+
+    def stats(self) -> dict:
+        counts = dict(self._counts)
+        calls = counts["leaders"] + counts["followers"] + counts["remote_followers"]
+        return {
+            "enabled": True,
+            "cross_process": self.client is not None,
+            **counts,
+            "coalesced_fraction": round((counts["followers"] + counts["remote_followers"]) / calls, 4) if calls else 0.0
+        }
+
+    def _forget(self, key: str, task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    async def _lead(self, key: str, fn):
+        if self.client is None:
+            self._count("leaders")
+            return await fn()
+
+        token = uuid.uuid4().hex
+        try:
+            # A leader that just finished has published its result and released the lock; check for the result first
+            pipe = self.client.pipeline(transaction=False)
+            pipe.get(RESULT_PREFIX + key)
+            pipe.set(LOCK_PREFIX + key, token, nx=True, px=int(self.lock_ttl * 1000))
+            published, acquired = await pipe.execute()
+        except Exception as e:
+            print(f"Error taking single-flight lock: {e}")
+            published, acquired = None, True  # Redis trouble must not block the call; go it alone
+            token = None
+
+        if published is not None:
+            if acquired and token is not None:
+                await self._publish(key, token, None)  # Publishes nothing; just gives the lock back
+            self._count("remote_followers")
+            return json.loads(published)
+
+        if not acquired:
+            result = await self._await_remote(key)
+            if result is not None:
+                self._count("remote_followers")
+                return result
+            self._count("remote_fallbacks")
+
+        self._count("leaders")
+        result = None
+        try:
+            result = await fn()
+            return result
+        finally:
+            # Also on failure, so remote followers stop waiting and make the call themselves
+            if token is not None:
+                await self._publish(key, token, result)
+
+    async def _await_remote(self, key: str) -> Optional[dict]:
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            try:
+                pipe = self.client.pipeline(transaction=False)
+                pipe.get(RESULT_PREFIX + key)
+                pipe.exists(LOCK_PREFIX + key)
+                result, locked = await pipe.execute()
+            except Exception as e:
+                print(f"Error polling single-flight result: {e}")
+                return None
+            if result is not None:
+                return json.loads(result)
+            if not locked:
+                return None
+            await asyncio.sleep(self.poll_interval)
+        return None
+
+    async def _publish(self, key: str, token: str, result) -> None:
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            # Nothing is published for a failed call; waiters then retry on their own rather than share the failure
+            if result:
+                pipe.set(RESULT_PREFIX + key, json.dumps(result), px=int(self.result_ttl * 1000))
+            pipe.get(LOCK_PREFIX + key)
+            if (await pipe.execute())[-1] == token:
+                await self.client.delete(LOCK_PREFIX + key)
+        except Exception as e:
+            print(f"Error publishing single-flight result: {e}")
+
+    def _count(self, name: str) -> None:
+        self._counts[name] += 1
+
+
+def single_flight_stats(single_flight: Optional[SingleFlight]) -> dict:
+    return single_flight.stats() if single_flight is not None else {"enabled": False}
+
+
+def single_flight_settings() -> Optional[dict]:
+    """Settings from BEDROCK_SINGLE_FLIGHT_* environment variables; None when BEDROCK_SINGLE_FLIGHT=false"""
+    if os.getenv("BEDROCK_SINGLE_FLIGHT", "true").lower() != "true":
+        return None
+    return {
+        "cross_process": os.getenv("BEDROCK_SINGLE_FLIGHT_REDIS", "false").lower() == "true",
+        "lock_ttl": float(os.getenv("BEDROCK_SINGLE_FLIGHT_LOCK_TTL", "30")),
+        "result_ttl": float(os.getenv("BEDROCK_SINGLE_FLIGHT_RESULT_TTL", "10")),
+        "poll_interval": float(os.getenv("BEDROCK_SINGLE_FLIGHT_POLL_INTERVAL", "0.05"))
+    }
+
+
+def _single_flight_client(settings: dict, client):
+    """The Redis client for cross-process coalescing, or None to coalesce in-process only"""
+    if not settings.pop("cross_process"):
+        return None
+    if client is not None:
+        return client
+    url = os.getenv("BEDROCK_SINGLE_FLIGHT_REDIS_URL")
+    if not url or aioredis is None:
+        print("⚠ BEDROCK_SINGLE_FLIGHT_REDIS is enabled but BEDROCK_SINGLE_FLIGHT_REDIS_URL is not set; coalescing in-process only")
+        return None
+    return aioredis.Redis.from_url(url, decode_responses=True)
+
+
+def create_single_flight(client=None) -> Optional[SingleFlight]:
+    settings = single_flight_settings()
+    if settings is None:
+        return None
+    return SingleFlight(_single_flight_client(settings, client), **settings)
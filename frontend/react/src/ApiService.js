@@ -7,8 +7,11 @@ const LANGGRAPH_API_URL = '/langgraph/'
 
 class ApiService {
   // Main Backend API (Port 5000)
-  static async fetchCards() {
-    const response = await fetch(`${API_BASE_URL}/cards`)
+  static async fetchCards({ limit = 50, cursor = null, fields = null } = {}) {
+    const params = new URLSearchParams({ limit })
+    if (cursor) params.set('cursor', cursor)
+    if (fields) params.set('fields', fields.join(','))
+    const response = await fetch(`${API_BASE_URL}/cards?${params}`)
     if (!response.ok) throw new Error(`HTTP ${response.status}`)
     return response.json()
   }
@@ -23,6 +26,61 @@ class ApiService {
     return response.json()
   }
 
+  // Streams card creation as Server-Sent Events: `context`, then `token`
+  // chunks, then `done` with the saved card (or `error`)
+  static async streamCreateCard(text, title = null, onEvent) {
+    return ApiService.streamEvents(`${API_BASE_URL}/add-text`, { text, title, stream: true }, onEvent)
+  }
+
+  static async streamKnowledgePreview(text, onEvent) {
+    return ApiService.streamEvents(`${API_BASE_URL}/knowledge-preview`, { text, stream: true }, onEvent)
+  }
+
+  // Saves a preview as a card without regenerating it; previewToken comes
+  // from the preview's `done` event and expires after a few minutes
+  static async commitPreview(previewToken, title = null) {
+    const response = await fetch(`${API_BASE_URL}/previews/${encodeURIComponent(previewToken)}/commit`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ title })
+    })
+    if (!response.ok) throw new Error(`HTTP ${response.status}`)
+    return response.json()
+  }
+
+  // POSTs `body` and calls onEvent(event, data) for each SSE message received
+  static async streamEvents(url, body, onEvent) {
+    const response = await fetch(url, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+      body: JSON.stringify(body)
+    })
+    if (!response.ok) throw new Error(`HTTP ${response.status}`)
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    while (true) {
+      const { done, value } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      let boundary
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const message = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+
+        let event = 'message'
+        let data = ''
+        for (const line of message.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7)
+          else if (line.startsWith('data: ')) data += line.slice(6)
+        }
+        if (data) onEvent(event, JSON.parse(data))
+      }
+    }
+  }
+
   static async updateCard(cardId, data) {
     const response = await fetch(`${API_BASE_URL}/cards/${cardId}`, {
       method: 'PUT',
@@ -65,8 +123,20 @@ class ApiService {
     return response.json()
   }
 
-  static async getSessionHistory(sessionId, limit = 10) {
-    const response = await fetch(`${LANGGRAPH_API_URL}/sessions/${sessionId}/history?limit=${limit}`)
+  // Streams a chat turn: `session`, `intent`, `card`, `token` events, then `done`
+  static async streamChatMessage(message, sessionId = null, onEvent, focusedCard = null) {
+    return ApiService.streamEvents(`${LANGGRAPH_API_URL}/chat/stream`, {
+      message,
+      session_id: sessionId,
+      ...(focusedCard && { focused_card: focusedCard })
+    }, onEvent)
+  }
+
+  // Newest page first; pass the returned `next_cursor` to load older messages
+  static async getSessionHistory(sessionId, limit = 10, cursor = null) {
+    const params = new URLSearchParams({ limit })
+    if (cursor) params.set('cursor', cursor)
+    const response = await fetch(`${LANGGRAPH_API_URL}/sessions/${sessionId}/history?${params}`)
     if (!response.ok) throw new Error(`HTTP ${response.status}`)
     return response.json()
   }
@@ -99,12 +99,21 @@ const App = () => {
   const fetchCards = async () => {
     try {
       setIsLoading(true)
-      const response = await axios.get(`${API_BASE_URL}/cards`)
-      if (response.data.success) {
-        setCards(response.data.cards)
-        if (response.data.cards.length > 0 && !focusedCard) {
-          setFocusedCard(response.data.cards[0])
-        }
+      // /cards is paginated; follow the cursor until every page is loaded
+      const allCards = []
+      let cursor = null
+      do {
+        const response = await axios.get(`${API_BASE_URL}/cards`, {
+          params: { limit: 200, ...(cursor && { cursor }) }
+        })
+        if (!response.data.success) return
+        allCards.push(...response.data.cards)
+        cursor = response.data.next_cursor
+      } while (cursor)
+
+      setCards(allCards)
+      if (allCards.length > 0 && !focusedCard) {
+        setFocusedCard(allCards[0])
       }
     } catch (err) {
       setError('Failed to fetch cards: ' + err.message)
@@ -0,0 +1,197 @@
+"""Semantic cache for answers to informational (NO_ACTION) questions.
+
+Answers are grouped in Redis by focused card ID, one hash per card plus one
+for turns with no card. A question is embedded with Titan and compared with
+the cached questions for the same card. The closest one is reused if its
+cosine similarity reaches ANSWER_CACHE_THRESHOLD. Each entry records a
+fingerprint of the card it was answered against. Entries are dropped when
+that card is edited, whether in chat or elsewhere.
+"""
+from array import array
+from typing import Optional
+import base64
+import hashlib
+import json
+import math
+import os
+import time
+
+from metrics import ANSWER_CACHE_DURATION, histogram_stats
+
+KEY_PREFIX = "answer_cache:card:"
+NO_CARD = "none"
+
+
+def answer_cache_key(card_id) -> str:
+    return f"{KEY_PREFIX}{card_id if card_id is not None else NO_CARD}"
+
+
+def normalize_question(question: str) -> str:
+    return " ".join((question or "").lower().split())
+
+
+def card_fingerprint(card: Optional[dict]) -> str:
+    """Changes whenever the focused card's title or content does"""
+    if not card:
+        return NO_CARD
+    digest = hashlib.sha256(f"{card.get('title', '')}\x00{card.get('content', '')}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def pack_embedding(embedding: list) -> str:
+    return base64.b64encode(array("f", embedding).tobytes()).decode("ascii")
+
+
+def unpack_embedding(packed: str) -> array:
+    return array("f", base64.b64decode(packed))
+
+
+def cosine_similarity(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class SemanticAnswerCache:
+    """Answer cache on a redis.asyncio client; errors are logged and treated as misses"""
+
+    def __init__(self, client, ai_service, threshold: float = 0.92, ttl: int = 3600,
+                 max_per_card: int = 100, dimensions: int = 256):
+        self.client = client
+        self.ai_service = ai_service
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_card = max_per_card
+        self.dimensions = dimensions
+        self._counts = {"hits": 0, "misses": 0, "stores": 0, "stale": 0, "invalidations": 0}
+
+    async def lookup(self, question: str, focused_card: Optional[dict]) -> tuple:
+        """(cached answer or None, question embedding to pass to store())"""
+        started = time.perf_counter()
+        try:
+            embedding = await self.ai_service.generate_embedding(normalize_question(question), dimensions=self.dimensions)
+        except Exception as e:
+            print(f"Error embedding question for answer cache: {e}")
+            return None, None
+        try:
+            entries = await self.client.hgetall(answer_cache_key(self._card_id(focused_card)))
+        except Exception as e:
+            print(f"Error reading answer cache: {e}")
+            entries = {}
+        answer, stale = self._best_match(entries, embedding, card_fingerprint(focused_card))
+        if stale:
+            await self._drop(focused_card, stale)
+        self._record_lookup(answer, started)
+        return answer, embedding
+
+    async def store(self, question: str, focused_card: Optional[dict], embedding: Optional[list], answer: str) -> None:
+        if not embedding or not answer:
+            return
+        key = answer_cache_key(self._card_id(focused_card))
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            self._queue_store(pipe, key, question, focused_card, embedding, answer)
+            size = (await pipe.execute())[-1]
+            if size > self.max_per_card:
+                self._queue_evict(pipe, key, await self.client.hgetall(key), size)
+                await pipe.execute()
+            self._count("stores")
+        except Exception as e:
+            print(f"Error writing answer cache: {e}")
+
+    async def invalidate(self, card_id) -> None:
+        """Forget every answer given against card_id, e.g. after the card is updated"""
+        try:
+            await self.client.delete(answer_cache_key(card_id))
+            self._count("invalidations")
+        except Exception as e:
+            print(f"Error invalidating answer cache: {e}")
+
+    def record_generation(self, elapsed_ms: float) -> None:
+        ANSWER_CACHE_DURATION.labels("generate").observe(elapsed_ms / 1000)
+
+    def stats(self) -> dict:
+        counts = dict(self._counts)
+        lookups = counts["hits"] + counts["misses"]
+        return {
+            "enabled": True,
+            **counts,
+            "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0,
+            "threshold": self.threshold,
+            "latency": histogram_stats(ANSWER_CACHE_DURATION)
+        }
+
+    def _card_id(self, focused_card: Optional[dict]):
+        return focused_card.get("id") if focused_card else None
+
+    def _best_match(self, entries: dict, embedding: list, fingerprint: str) -> tuple:
+        """(answer of the closest entry at or above threshold, fields of entries for an older card version)"""
+        best_answer, best_score, stale = None, self.threshold, []
+        for field, raw in entries.items():
+            entry = json.loads(raw)
+            if entry["card"] != fingerprint:
+                stale.append(field)
+                continue
+            score = cosine_similarity(embedding, unpack_embedding(entry["embedding"]))
+            if score >= best_score:
+                best_answer, best_score = entry["answer"], score
+        return best_answer, stale
+
+    def _queue_store(self, pipe, key: str, question: str, focused_card: Optional[dict], embedding: list, answer: str) -> None:
+        normalized = normalize_question(question)
+        entry = {
+            "question": normalized,
+            "answer": answer,
+            "card": card_fingerprint(focused_card),
+            "embedding": pack_embedding(embedding),
+            "stored_at": time.time()
+        }
+        pipe.hset(key, hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16], json.dumps(entry))
+        pipe.expire(key, self.ttl)
+        pipe.hlen(key)
+
+    def _queue_evict(self, pipe, key: str, entries: dict, size: int) -> None:
+        oldest = sorted(entries, key=lambda field: json.loads(entries[field])["stored_at"])
+        excess = oldest[:size - self.max_per_card]
+        if excess:
+            pipe.hdel(key, *excess)
+
+    async def _drop(self, focused_card: Optional[dict], fields: list) -> None:
+        try:
+            await self.client.hdel(answer_cache_key(self._card_id(focused_card)), *fields)
+            self._count("stale", len(fields))
+        except Exception as e:
+            print(f"Error pruning answer cache: {e}")
+
+    def _record_lookup(self, answer: Optional[str], started: float) -> None:
+        outcome = "hits" if answer is not None else "misses"
+        self._count(outcome)
+        ANSWER_CACHE_DURATION.labels("hit" if answer is not None else "miss").observe(time.perf_counter() - started)
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        self._counts[name] += amount
+
+
+def answer_cache_stats(cache: Optional[SemanticAnswerCache]) -> dict:
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+def answer_cache_settings() -> Optional[dict]:
+    """Settings from ANSWER_CACHE_* environment variables; None unless ANSWER_CACHE=true"""
+    if os.getenv("ANSWER_CACHE", "false").lower() != "true":
+        return None
+    return {
+        "threshold": float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+        "ttl": int(os.getenv("ANSWER_CACHE_TTL", "3600")),
+        "max_per_card": int(os.getenv("ANSWER_CACHE_MAX_PER_CARD", "100")),
+        "dimensions": int(os.getenv("ANSWER_CACHE_DIMENSIONS", "256"))
+    }
+
+
+def create_answer_cache(client, ai_service) -> Optional[SemanticAnswerCache]:
+    settings = answer_cache_settings()
+    if settings is None:
+        return None
+    print(f"✓ Semantic answer cache enabled (threshold {settings['threshold']})")
+    return SemanticAnswerCache(client, ai_service, **settings)
+
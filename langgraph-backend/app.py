@@ -1,10 +1,23 @@
 from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
 from typing import TypedDict, Optional
 from ai_service import AIService
-from database import create_database_manager, ConversationStateManager
+from bedrock_limiter import BedrockError
+from backend_client import BackendClient
+from database import create_database_manager
+from intent_classifier import create_intent_classifier, create_intent_log
+from llm_cache import create_llm_cache
+from answer_cache import create_answer_cache
+from single_flight import create_single_flight
+from metrics import timed_node
+from tracing import traced_node
+import asyncio
+import httpx
 import json
-import requests
 import uuid
+from datetime import datetime
+import os
+import time
 
 # Define the state structure
 class ConversationState(TypedDict):
@@ -17,36 +30,101 @@ class ConversationState(TypedDict):
     card_id: Optional[int]
     updated_card: Optional[dict]
     focused_card: Optional[dict]
+    prefetched_cards: Optional[dict]
+    pending_focused_card: Optional[dict]
+
+def chat_response_data(result):
+    """Shape a workflow result for the chat API"""
+    return {
+        "message": result["user_message"],
+        "response": result["response"],
+        "intent": result["intent"],
+        "confidence": result["confidence"],
+        "reasoning": result["reasoning"],
+        "session_id": result["session_id"],
+        "card_id": result.get("card_id"),
+        "updated_card": result.get("updated_card"),
+        "focused_card": result.get("focused_card"),
+        "timestamp": datetime.now().isoformat()
+    }
 
 class ConversationalWorkflow:
+    """The chat workflow as a LangGraph of coroutine nodes, run via graph.ainvoke/astream.
+    
+    Bedrock, Redis and backend calls all go through non-blocking clients, so
+    one event loop can carry many chats at once. Construct, then await init()
+    inside the loop.
+    """
     def __init__(self, backend_url="http://backend-service:5000", use_redis=True, redis_host="langgraph-db-service", redis_port=6379):
         self.ai_service = AIService()
         self.backend_url = backend_url
+        self.backend = None
         self.use_redis = use_redis
+        self.redis_host = redis_host
+        self.redis_port = redis_port
+        
+        # Update candidates are fetched alongside the intent call (see analyze_intent_node)
+        self.speculative_retrieval = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+        self.update_candidate_limit = int(os.getenv("UPDATE_CANDIDATES", "5"))
+        
+        # Local fast path in front of the intent LLM call; LLM labels are logged for training
+        self.intent_classifier = create_intent_classifier()
+        self.intent_log = create_intent_log()
         
-        # Initialize Redis state manager if enabled
         self.state_manager = None
-        if use_redis:
+        self.answer_cache = None
+        self._sweeper = None
+        
+        self.graph = self._build_graph()
+    
+    async def init(self):
+        """Open Redis and the backend client on the running event loop"""
+        # Initialize Redis state manager if enabled
+        if self.use_redis:
             try:
-                self.state_manager = create_database_manager(host=redis_host, port=redis_port)
-                print(f"✓ Redis state management enabled on {redis_host}:{redis_port}")
+                self.state_manager = await create_database_manager(host=self.redis_host, port=self.redis_port)
+                print(f"✓ Redis state management enabled on {self.redis_host}:{self.redis_port}")
+                
+                # Prune idle sessions from the active-session index
+                sweep_interval = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+                if sweep_interval > 0:
+                    self._sweeper = asyncio.create_task(self.state_manager.run_session_sweeper(sweep_interval))
+                
+                # Opt-in (LLM_CACHE=true) response cache shares the session Redis
+                self.ai_service.response_cache = create_llm_cache(self.state_manager.redis.client)
+                self.answer_cache = create_answer_cache(self.state_manager.redis.client, self.ai_service)
+                # Lets other replicas wait on our Bedrock calls when BEDROCK_SINGLE_FLIGHT_REDIS=true
+                self.ai_service.single_flight = create_single_flight(self.state_manager.redis.client)
             except Exception as e:
                 print(f"⚠ Redis unavailable, using in-memory state: {e}")
                 self.use_redis = False
         
-        self.graph = self._build_graph()
+        self.backend = BackendClient(self.backend_url)
+    
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        if self.backend is not None:
+            await self.backend.close()
+        if self.state_manager is not None:
+            await self.state_manager.redis.close()
+        await self.ai_service.close()
     
     def _build_graph(self) -> StateGraph:
         """Build the LangGraph workflow"""
         workflow = StateGraph(ConversationState)
         
-        # Add nodes
-        workflow.add_node("load_session", self.load_session_node)
-        workflow.add_node("analyze_intent", self.analyze_intent_node)
-        workflow.add_node("generate_response", self.generate_response_node)
-        workflow.add_node("create_card", self.create_card_node)
-        workflow.add_node("update_card", self.update_card_node)
-        workflow.add_node("save_session", self.save_session_node)
+        # Add nodes, each timed and traced
+        nodes = {
+            "load_session": self.load_session_node,
+            "analyze_intent": self.analyze_intent_node,
+            "generate_response": self.generate_response_node,
+            "create_card": self.create_card_node,
+            "update_card": self.update_card_node,
+            "save_session": self.save_session_node
+        }
+        for name, node in nodes.items():
+            workflow.add_node(name, timed_node(name, traced_node(name, node)))
         
         # Define the flow
         workflow.set_entry_point("load_session")
@@ -77,95 +155,192 @@ class ConversationalWorkflow:
         
         return workflow.compile()
     
-    def load_session_node(self, state: ConversationState) -> ConversationState:
-        """Load session context and focused card from Redis"""
+    async def load_session_node(self, state: ConversationState) -> ConversationState:
+        """Load session context and focused card from Redis in one round trip.
+        
+        Nothing is written here: a new session, a focused card sent with the
+        request and the activity update are all persisted by save_session_node.
+        """
         session_id = state.get("session_id")
-        focused_card_from_request = state.get("focused_card")  # From process_message parameter
-        
-        if not self.use_redis or not session_id:
-            # Create new session if none provided
-            if self.use_redis and self.state_manager:
-                new_session_id = self.state_manager.create_new_session()
-                state["session_id"] = new_session_id
-                print(f"Created new session: {new_session_id[:8]}...")
-                
-                # If focused card was provided in request, save it to the new session
-                if focused_card_from_request:
-                    self.state_manager.save_focused_card(new_session_id, focused_card_from_request)
-                    print(f"✓ Set focused card for new session: {focused_card_from_request.get('title', 'Untitled')}")
+        state["pending_focused_card"] = state.get("focused_card")  # From process_message parameter
+        
+        if not self.use_redis or not self.state_manager:
+            return state
+        
+        if not session_id:
+            # New session; its record is created when the turn commits
+            state["session_id"] = str(uuid.uuid4())
+            print(f"Created new session: {state['session_id'][:8]}...")
             return state
         
         print(f"Loading session: {session_id[:8]}...")
+        self._apply_loaded_session(state, await self.state_manager.load_session(session_id))
+        
+        return state
+    
+    def _apply_loaded_session(self, state: ConversationState, loaded: dict) -> None:
+        """Merge a load_session() result into the state; a focused card from the request wins"""
+        if state.get("focused_card"):
+            if self._same_card(state["focused_card"], loaded["focused_card"]):
+                state["pending_focused_card"] = None  # Already stored; the commit only refreshes its TTL
+            else:
+                print(f"✓ Updated focused card from request: {state['focused_card'].get('title', 'Untitled')}")
+            return
         
-        # Load previous conversation state
-        previous_state = self.state_manager.load_conversation_state(session_id)
+        previous_state = loaded["conversation_state"]
         if previous_state:
             print(f"✓ Loaded previous conversation state")
-            # Merge relevant fields from previous state, but don't override focused_card from request
-            if "focused_card" in previous_state and not focused_card_from_request:
+            if "focused_card" in previous_state:
                 state["focused_card"] = previous_state["focused_card"]
         
-        # Load focused card from Redis (unless we have one from the request)
-        if not focused_card_from_request:
-            focused_card = self.state_manager.load_focused_card(session_id)
-            if focused_card:
-                state["focused_card"] = focused_card
-                print(f"✓ Loaded focused card from Redis: {focused_card.get('title', 'Untitled')}")
-            else:
-                print("⚠ No focused card found in session")
+        focused_card = loaded["focused_card"]
+        if focused_card:
+            state["focused_card"] = focused_card
+            print(f"✓ Loaded focused card from Redis: {focused_card.get('title', 'Untitled')}")
         else:
-            # Update Redis with the focused card from the request
-            self.state_manager.save_focused_card(session_id, focused_card_from_request)
-            print(f"✓ Updated focused card from request: {focused_card_from_request.get('title', 'Untitled')}")
-        
-        # Update session activity
-        self.state_manager.update_session_activity(session_id)
-        
-        return state
+            print("⚠ No focused card found in session")
+    
+    def _same_card(self, card: dict, stored: Optional[dict]) -> bool:
+        return bool(stored) and all(card.get(field) == stored.get(field) for field in ("id", "title", "content"))
     
-    def save_session_node(self, state: ConversationState) -> ConversationState:
-        """Save conversation state and history to Redis"""
+    async def save_session_node(self, state: ConversationState) -> ConversationState:
+        """Save conversation state, history and focused card to Redis"""
         if not self.use_redis or not state.get("session_id"):
             return state
         
         session_id = state["session_id"]
         
-        # Save conversation state
-        conversation_state = {
+        # Session hash, history and TTLs in one round trip
+        await self.state_manager.commit_turn(
+            session_id,
+            self._conversation_state_record(state),
+            self._history_entry(state),
+            focused_card=state.get("pending_focused_card")
+        )
+        
+        print(f"✓ Session state saved: {session_id[:8]}...")
+        return state
+    
+    def _conversation_state_record(self, state: ConversationState) -> dict:
+        return {
             "intent": state.get("intent"),
             "confidence": state.get("confidence"),
             "reasoning": state.get("reasoning"),
             "focused_card": state.get("focused_card"),
             "last_message": state.get("user_message")
         }
-        
-        self.state_manager.save_conversation_state(session_id, conversation_state)
-        
-        # Add message to history
-        message_entry = {
+    
+    def _history_entry(self, state: ConversationState) -> dict:
+        return {
             "user_message": state["user_message"],
             "intent": state.get("intent"),
             "confidence": state.get("confidence"),
             "response": state.get("response"),
             "card_id": state.get("card_id")
         }
+    
+    def _focused_card_summary(self, card: dict) -> dict:
+        """Trim a card down to what the session keeps as its focused card"""
+        content = card.get("content") or ""
+        return {
+            "id": card["id"],
+            "title": card["title"],
+            "content": content[:200] + "..." if len(content) > 200 else content
+        }
+    
+    async def analyze_intent_node(self, state: ConversationState) -> ConversationState:
+        """Analyze the user's intent with focused card context.
+        
+        Confident local classifications skip the LLM entirely. Otherwise
+        UPDATE turns need the candidate cards next, so that fetch is started
+        before the LLM call and its result kept only if the intent is UPDATE.
+        """
+        if self._apply_local_intent(state):
+            state["prefetched_cards"] = None
+        else:
+            prefetch = self._start_prefetch(state) if self.speculative_retrieval else None
+            try:
+                started = time.perf_counter()
+                try:
+                    response = await self.ai_service.generate_text(self._intent_prompt(state), max_tokens=200, cache_site="intent")
+                except BedrockError as e:
+                    print(f"⚠ Intent analysis unavailable, falling back: {e}")
+                    response = ""
+                if self._apply_intent(state, response):
+                    self._log_intent(state, started)
+                
+                state["prefetched_cards"] = await self._finish_prefetch(prefetch, state["intent"])
+            finally:
+                # Also stops the fetch when this node is cancelled, e.g. a /chat/stream client went away
+                if prefetch is not None:
+                    prefetch.cancel()
         
-        self.state_manager.add_message_to_history(session_id, message_entry)
-        
-        # Update focused card if we updated one
-        if state.get("updated_card"):
-            focused_card_data = {
-                "id": state["updated_card"]["id"],
-                "title": state["updated_card"]["title"],
-                "content": state["updated_card"]["content"][:200] + "..." if len(state["updated_card"]["content"]) > 200 else state["updated_card"]["content"]
-            }
-            self.state_manager.save_focused_card(session_id, focused_card_data)
+        print(f"Intent: {state['intent']} (confidence: {state['confidence']})")
+        print(f"Reasoning: {state['reasoning']}")
         
-        print(f"✓ Session state saved: {session_id[:8]}...")
         return state
     
-    def analyze_intent_node(self, state: ConversationState) -> ConversationState:
-        """Analyze the user's intent with focused card context"""
+    def _apply_local_intent(self, state: ConversationState) -> bool:
+        """Set the intent from the local classifier when it is confident enough"""
+        if not self.intent_classifier:
+            return False
+        
+        result = self.intent_classifier.classify(state["user_message"], state.get("focused_card"))
+        if result is None:
+            return False
+        
+        state["intent"] = result["intent"]
+        state["confidence"] = result["confidence"]
+        state["reasoning"] = result["reasoning"]
+        return True
+    
+    def _log_intent(self, state: ConversationState, started: float) -> None:
+        if self.intent_log:
+            self.intent_log.record(
+                state["user_message"],
+                state.get("focused_card"),
+                state["intent"],
+                state["confidence"],
+                (time.perf_counter() - started) * 1000
+            )
+    
+    def _start_prefetch(self, state: ConversationState) -> asyncio.Task:
+        prefetch = asyncio.create_task(self._fetch_update_candidates(self._candidate_search(state)))
+        # Retrieve the outcome of a discarded fetch so a failure isn't logged as never retrieved
+        prefetch.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return prefetch
+    
+    async def _finish_prefetch(self, prefetch, intent: str) -> Optional[dict]:
+        """Keep the speculative candidate fetch for UPDATE turns; the caller cancels it otherwise"""
+        if prefetch is None or intent != "UPDATE":
+            return None
+        try:
+            return await prefetch
+        except httpx.HTTPError as e:
+            print(f"⚠ Candidate prefetch failed, refetching: {e}")
+            return None
+    
+    def _candidate_search(self, state: ConversationState) -> dict:
+        """POST /search body for the cards most relevant to this message, the focused card first"""
+        focused_card = state.get("focused_card") or {}
+        return {
+            "query": state["user_message"],
+            "limit": self.update_candidate_limit,
+            "card_id": focused_card.get("id")
+        }
+    
+    async def _fetch_update_candidates(self, search: dict) -> dict:
+        cards_response = await self.backend.post("/search", json=search, idempotent=True)
+        return self._candidates_result(cards_response)
+    
+    def _candidates_result(self, cards_response) -> dict:
+        return {
+            "status_code": cards_response.status_code,
+            "cards_data": cards_response.json() if cards_response.status_code == 200 else None
+        }
+    
+    def _intent_prompt(self, state: ConversationState) -> str:
+        """Build the intent classification prompt with focused card context"""
         user_message = state["user_message"]
         focused_card = state.get("focused_card")
         
@@ -195,32 +370,53 @@ Respond with ONLY a JSON object:
   "confidence": 0.0-1.0,
   "reasoning": "Brief explanation considering focused card context"
 }}"""
-
-        response = self.ai_service.generate_text(prompt, max_tokens=200)
-        
+        return prompt
+    
+    def _apply_intent(self, state: ConversationState, response: str) -> bool:
+        """Parse the intent classifier's JSON reply into the state; False if it had to fall back"""
         try:
             result = json.loads(response)
             state["intent"] = result.get("action", "NO_ACTION")
             state["confidence"] = result.get("confidence", 0.5)
             state["reasoning"] = result.get("reasoning", "Analysis completed")
+            return True
         except json.JSONDecodeError:
             # Fallback if JSON parsing fails
             state["intent"] = "NO_ACTION"
             state["confidence"] = 0.5
             state["reasoning"] = "Failed to parse intent analysis"
-        
-        print(f"Intent: {state['intent']} (confidence: {state['confidence']})")
-        print(f"Reasoning: {state['reasoning']}")
-        
-        return state
+            return False
     
-    def create_card_node(self, state: ConversationState) -> ConversationState:
+    async def create_card_node(self, state: ConversationState) -> ConversationState:
         """Create a new knowledge card based on user input"""
         user_message = state["user_message"]
         
         try:
             # Use AI to extract title and content for the new card
-            extraction_prompt = f"""Based on the user's message, create a structured knowledge card.
+            extraction_response = await self.ai_service.generate_text(self._card_extraction_prompt(user_message), max_tokens=600, cache_site="card_extraction")
+            plan = self._card_creation_plan(user_message, extraction_response)
+            
+            # Make the creation request
+            create_response = await self.backend.post(plan["path"], json=plan["create_data"], timeout=self._create_timeout(plan))
+            
+            if create_response.status_code == 200:
+                self._apply_card_created(state, plan, create_response.json())
+            else:
+                self._apply_card_creation_failed(state, plan, create_response.text)
+                
+        except httpx.HTTPError as e:
+            state["response"] = f"Error connecting to the backend: {str(e)}"
+        except BedrockError as e:
+            state["response"] = f"The AI service is unavailable right now, please try again: {str(e)}"
+        
+        return state
+    
+    def _create_timeout(self, plan: dict) -> Optional[float]:
+        # Only /add-text waits on a Bedrock generation; POST /cards uses the default timeout
+        return None if plan["structured"] else self.backend.generate_timeout
+    
+    def _card_extraction_prompt(self, user_message: str) -> str:
+        return f"""Based on the user's message, create a structured knowledge card.
 
 User message: "{user_message}"
 
@@ -236,113 +432,134 @@ Respond with ONLY a JSON object:
   "category": "Suggested category (optional)",
   "tags": ["relevant", "tags", "for", "searchability"]
 }}"""
-
-            extraction_response = self.ai_service.generate_text(extraction_prompt, max_tokens=600)
-            
-            try:
-                card_data = json.loads(extraction_response)
-                title = card_data.get("title", "New Knowledge Card")
-                content = card_data.get("content", user_message)
-                
-                # Format content with HTML structure for the backend
-                formatted_content = f"<h3 class='card-heading'>{title}</h3><p class='card-description'>{content}</p>"
-                
-                # Prepare data for backend API
-                create_data = {
-                    "text": content,
-                    "title": title
-                }
-                
-                # Add metadata about the creation
-                if card_data.get("category") or card_data.get("tags"):
-                    create_data["metadata"] = {
-                        "created_by": "langgraph_conversation",
-                        "source_message": user_message,
-                        "category": card_data.get("category"),
-                        "tags": card_data.get("tags", [])
-                    }
-                
-                # Make the creation request
-                create_response = requests.post(
-                    f"{self.backend_url}/add-text",
-                    json=create_data,
-                    headers={'Content-Type': 'application/json'}
-                )
-                
-                if create_response.status_code == 200:
-                    creation_result = create_response.json()
-                    card_id = creation_result.get("card_id")
-                    
-                    state["card_id"] = card_id
-                    state["response"] = f"✅ Successfully created new knowledge card: '{title}' (ID: {card_id})"
-                    
-                    # Set the created card as focused for the session
-                    if self.use_redis and state.get("session_id"):
-                        focused_card_data = {
-                            "id": card_id,
-                            "title": title,
-                            "content": content[:200] + "..." if len(content) > 200 else content
-                        }
-                        if self.state_manager:
-                            self.state_manager.save_focused_card(state["session_id"], focused_card_data)
-                            print(f"✓ Set new card as focused: {title}")
-                    
-                else:
-                    state["response"] = f"Failed to create card: {create_response.text}"
-                    
-            except json.JSONDecodeError:
-                # Fallback: create with basic info
-                title = f"Knowledge from conversation"
-                create_data = {
+    
+    def _card_creation_plan(self, user_message: str, extraction_response: str) -> dict:
+        """Turn the extraction reply into a backend create request.
+        
+        Structured replies are already a finished card, so they go to POST /cards,
+        which only embeds and stores them. When the reply isn't valid JSON the raw
+        message goes to /add-text for the backend to write up; "structured"
+        records which path was taken.
+        """
+        try:
+            card_data = json.loads(extraction_response)
+        except json.JSONDecodeError:
+            # Fallback: create with basic info
+            title = "Knowledge from conversation"
+            return {
+                "structured": False,
+                "title": title,
+                "content": user_message,
+                "path": "/add-text",
+                "create_data": {
                     "text": user_message,
                     "title": title
                 }
-                
-                create_response = requests.post(
-                    f"{self.backend_url}/add-text",
-                    json=create_data,
-                    headers={'Content-Type': 'application/json'}
-                )
-                
-                if create_response.status_code == 200:
-                    creation_result = create_response.json()
-                    card_id = creation_result.get("card_id")
-                    state["card_id"] = card_id
-                    state["response"] = f"✅ Created knowledge card from your message (ID: {card_id})"
-                else:
-                    state["response"] = "I had trouble structuring the information for a new card."
-                
-        except requests.RequestException as e:
-            state["response"] = f"Error connecting to the backend: {str(e)}"
+            }
         
-        return state
+        title = card_data.get("title", "New Knowledge Card")
+        content = card_data.get("content", user_message)
+        
+        # Prepare data for backend API
+        create_data = {
+            "title": title,
+            "content": content,
+            "metadata": {
+                "created_by": "langgraph_conversation",
+                "source_message": user_message,
+                "category": card_data.get("category"),
+                "tags": card_data.get("tags", [])
+            }
+        }
+        
+        return {
+            "structured": True,
+            "title": title,
+            "content": content,
+            "path": "/cards",
+            "create_data": create_data
+        }
+    
+    def _apply_card_created(self, state: ConversationState, plan: dict, creation_result: dict) -> None:
+        """Record a successful creation; structured cards become the session's focused card"""
+        card_id = creation_result.get("card_id")
+        state["card_id"] = card_id
+        
+        if not plan["structured"]:
+            state["response"] = f"✅ Created knowledge card from your message (ID: {card_id})"
+            return
+        
+        state["response"] = f"✅ Successfully created new knowledge card: '{plan['title']}' (ID: {card_id})"
+        self._focus_card(state, {"id": card_id, "title": plan["title"], "content": plan["content"]})
+        print(f"✓ Set new card as focused: {plan['title']}")
     
-    def update_card_node(self, state: ConversationState) -> ConversationState:
+    def _focus_card(self, state: ConversationState, card: dict) -> None:
+        """Make card the focused card; save_session_node persists it"""
+        state["focused_card"] = self._focused_card_summary(card)
+        state["pending_focused_card"] = state["focused_card"]
+    
+    def _apply_card_creation_failed(self, state: ConversationState, plan: dict, error_text: str) -> None:
+        if plan["structured"]:
+            state["response"] = f"Failed to create card: {error_text}"
+        else:
+            state["response"] = "I had trouble structuring the information for a new card."
+    
+    async def update_card_node(self, state: ConversationState) -> ConversationState:
         """Update an existing card based on user input"""
         user_message = state["user_message"]
         
         try:
-            # First, get all cards to find the most relevant one to update
-            cards_response = requests.get(f"{self.backend_url}/cards")
+            # Candidates were usually prefetched during intent analysis
+            candidates = state.get("prefetched_cards") or await self._fetch_update_candidates(self._candidate_search(state))
             
-            if cards_response.status_code != 200:
-                state["response"] = "Sorry, I couldn't retrieve the existing cards to update."
+            cards = self._update_candidates(state, candidates)
+            if cards is None:
                 return state
             
-            cards_data = cards_response.json()
-            if not cards_data.get("success") or not cards_data.get("cards"):
-                state["response"] = "No existing cards found to update."
+            # Use AI to determine which card to update and how
+            selection_response = await self.ai_service.generate_text(self._card_selection_prompt(user_message, cards), max_tokens=800, cache_site="card_selection")
+            
+            update_plan = self._card_update_plan(state, selection_response)
+            if update_plan is None:
                 return state
             
-            cards = cards_data["cards"]
+            # Make the update request
+            update_response = await self.backend.put(f"/cards/{update_plan['card_id']}", json=update_plan["update_data"])
             
-            # Use AI to determine which card to update and how
-            selection_prompt = f"""Based on the user's message, select which card should be updated and suggest the changes.
+            if update_response.status_code == 200:
+                self._apply_card_updated(state, update_plan, update_response.json())
+                if self.answer_cache:
+                    await self.answer_cache.invalidate(update_plan["card_id"])
+            else:
+                state["response"] = f"Failed to update card: {update_response.text}"
+                
+        except httpx.HTTPError as e:
+            state["response"] = f"Error connecting to the backend: {str(e)}"
+        except BedrockError as e:
+            state["response"] = f"The AI service is unavailable right now, please try again: {str(e)}"
+        
+        return state
+    
+    def _update_candidates(self, state: ConversationState, candidates: dict) -> Optional[list]:
+        """Pick the cards offered for an update; None (with a response set) when there are none"""
+        if candidates["status_code"] != 200:
+            state["response"] = "Sorry, I couldn't retrieve the existing cards to update."
+            return None
+        
+        cards_data = candidates["cards_data"]
+        if not cards_data.get("success") or not cards_data.get("cards"):
+            state["response"] = "No existing cards found to update."
+            return None
+        
+        return cards_data["cards"]
+    
+    def _card_selection_prompt(self, user_message: str, cards: list) -> str:
+        return f"""Based on the user's message, select which card should be updated and suggest the changes.
 
 User message: "{user_message}"
 
 Available cards:
-{self._format_cards_for_selection(cards[:5])}  # Show top 5 cards
+{self._format_cards_for_selection(cards)}
 
 Respond with ONLY a JSON object:
 {{
@@ -352,53 +569,46 @@ Respond with ONLY a JSON object:
   "suggested_content": "enhanced content that incorporates the user's input",
   "update_summary": "brief description of what was changed"
 }}"""
-
-            selection_response = self.ai_service.generate_text(selection_prompt, max_tokens=800)
-            
-            try:
-                update_plan = json.loads(selection_response)
-                card_id = update_plan.get("selected_card_id")
-                
-                if not card_id:
-                    state["response"] = "I couldn't determine which card to update based on your message."
-                    return state
-                
-                # Prepare update data
-                update_data = {}
-                if update_plan.get("suggested_title"):
-                    update_data["title"] = update_plan["suggested_title"]
-                if update_plan.get("suggested_content"):
-                    update_data["content"] = update_plan["suggested_content"]
-                
-                # Add metadata about the update
-                update_data["metadata"] = {
-                    "updated_by": "langgraph_conversation",
-                    "update_reason": update_plan.get("update_summary", "Updated via conversation"),
-                    "original_message": user_message
-                }
-                
-                # Make the update request
-                update_response = requests.put(
-                    f"{self.backend_url}/cards/{card_id}",
-                    json=update_data,
-                    headers={'Content-Type': 'application/json'}
-                )
-                
-                if update_response.status_code == 200:
-                    update_result = update_response.json()
-                    state["card_id"] = card_id
-                    state["updated_card"] = update_result.get("updated_card")
-                    state["response"] = f"✅ Successfully updated card: {update_plan.get('update_summary', 'Card updated')}"
-                else:
-                    state["response"] = f"Failed to update card: {update_response.text}"
-                    
-            except json.JSONDecodeError:
-                state["response"] = "I had trouble understanding how to update the cards based on your message."
-                
-        except requests.RequestException as e:
-            state["response"] = f"Error connecting to the backend: {str(e)}"
+    
+    def _card_update_plan(self, state: ConversationState, selection_response: str) -> Optional[dict]:
+        """Turn the selection reply into a PUT /cards/<id> request; None (with a response set) on failure"""
+        try:
+            update_plan = json.loads(selection_response)
+        except json.JSONDecodeError:
+            state["response"] = "I had trouble understanding how to update the cards based on your message."
+            return None
+        
+        card_id = update_plan.get("selected_card_id")
+        if not card_id:
+            state["response"] = "I couldn't determine which card to update based on your message."
+            return None
+        
+        # Prepare update data
+        update_data = {}
+        if update_plan.get("suggested_title"):
+            update_data["title"] = update_plan["suggested_title"]
+        if update_plan.get("suggested_content"):
+            update_data["content"] = update_plan["suggested_content"]
+        
+        # Add metadata about the update
+        update_data["metadata"] = {
+            "updated_by": "langgraph_conversation",
+            "update_reason": update_plan.get("update_summary", "Updated via conversation"),
+            "original_message": state["user_message"]
+        }
         
-        return state
+        return {
+            "card_id": card_id,
+            "update_data": update_data,
+            "update_summary": update_plan.get("update_summary", "Card updated")
+        }
+    
+    def _apply_card_updated(self, state: ConversationState, update_plan: dict, update_result: dict) -> None:
+        state["card_id"] = update_plan["card_id"]
+        state["updated_card"] = update_result.get("updated_card")
+        state["response"] = f"✅ Successfully updated card: {update_plan['update_summary']}"
+        if state["updated_card"]:
+            self._focus_card(state, state["updated_card"])
     
     def _format_cards_for_selection(self, cards: list) -> str:
         """Format cards for AI selection prompt"""
@@ -414,8 +624,46 @@ Respond with ONLY a JSON object:
         print(f"Routing to: {intent}")
         return intent
     
-    def generate_response_node(self, state: ConversationState) -> ConversationState:
-        """Generate a conversational response"""
+    async def generate_response_node(self, state: ConversationState) -> ConversationState:
+        """Generate a conversational response, reusing a cached answer to a paraphrase when one exists"""
+        prompt = self._response_prompt(state)
+        if prompt is None:
+            return state
+        
+        if not self._answer_cacheable(state):
+            state["response"] = await self._stream_response_text(prompt, max_tokens=300) or self._unavailable_reply()
+            return state
+        
+        question, focused_card = state["user_message"], state.get("focused_card")
+        answer, embedding = await self.answer_cache.lookup(question, focused_card)
+        if answer is not None:
+            state["response"] = self._emit_cached_answer(answer)
+            return state
+        
+        started = time.perf_counter()
+        response = await self._stream_response_text(prompt, max_tokens=300)
+        self.answer_cache.record_generation((time.perf_counter() - started) * 1000)
+        await self.answer_cache.store(question, focused_card, embedding, response)
+        state["response"] = response or self._unavailable_reply()
+        return state
+    
+    def _answer_cacheable(self, state: ConversationState) -> bool:
+        # Only informational replies; card confirmations describe what this turn did
+        return self.answer_cache is not None and state.get("intent") == "NO_ACTION"
+    
+    def _unavailable_reply(self) -> str:
+        # Generation failed before any text arrived (e.g. Bedrock throttling outlasted the retries)
+        reply = "Sorry, I couldn't generate a response right now. Please try again in a moment."
+        get_stream_writer()({"token": reply})
+        return reply
+    
+    def _emit_cached_answer(self, answer: str) -> str:
+        print("✓ Answered from semantic cache")
+        get_stream_writer()({"token": answer})
+        return answer
+    
+    def _response_prompt(self, state: ConversationState) -> Optional[str]:
+        """Pick the reply prompt for this turn; None keeps the response a card node already set"""
         user_message = state["user_message"]
         intent = state.get("intent", "NO_ACTION")
         
@@ -478,7 +726,7 @@ Keep it concise and informative."""
             # Create was attempted but failed
             if state.get("response"):
                 # Use the error message from create_card_node
-                return state
+                return None
             else:
                 prompt = f"""The user wants to create new knowledge: "{user_message}"
 
@@ -490,7 +738,7 @@ Keep it conversational and supportive."""
             # Update was attempted but failed
             if state.get("response"):
                 # Use the error message from update_card_node
-                return state
+                return None
             else:
                 prompt = f"""The user wants to update existing knowledge: "{user_message}"
 
@@ -503,24 +751,23 @@ Keep it conversational and helpful."""
             
 Keep it conversational and concise."""
         
-        response = self.ai_service.generate_text(prompt, max_tokens=300)
-        state["response"] = response
-        
-        return state
+        return prompt
     
-    def process_message(self, user_message: str, session_id: Optional[str] = None, focused_card: Optional[dict] = None) -> dict:
+    async def _stream_response_text(self, prompt: str, max_tokens: int) -> str:
+        """Generate the reply, forwarding tokens to stream_message() consumers as they arrive"""
+        writer = get_stream_writer()  # No-op unless the graph runs with stream_mode "custom"
+        chunks = []
+        try:
+            async for chunk in self.ai_service.generate_text_stream(prompt, max_tokens=max_tokens, cache_site="response"):
+                chunks.append(chunk)
+                writer({"token": chunk})
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+        return "".join(chunks)
+    
+    async def process_message(self, user_message: str, session_id: Optional[str] = None, focused_card: Optional[dict] = None) -> dict:
         """Process a user message through the workflow with session management"""
-        initial_state = {
-            "user_message": user_message,
-            "session_id": session_id,
-            "intent": None,
-            "confidence": None,
-            "reasoning": None,
-            "response": None,
-            "card_id": None,
-            "updated_card": None,
-            "focused_card": focused_card  # Set focused card from parameter
-        }
+        initial_state = self._initial_state(user_message, session_id, focused_card)
         
         print(f"\n=== Processing: '{user_message}' ===")
         if session_id:
@@ -529,8 +776,70 @@ Keep it conversational and concise."""
             print(f"Focused card: {focused_card.get('title', 'Untitled')}")
         
         # Run the workflow
-        final_state = self.graph.invoke(initial_state)
+        final_state = await self.graph.ainvoke(initial_state)
+        
+        return self._result_from_state(final_state)
+    
+    async def stream_message(self, user_message: str, session_id: Optional[str] = None, focused_card: Optional[dict] = None):
+        """Process a message, yielding (event, data) pairs as the workflow progresses.
+        
+        Events: "session" once the session is loaded, "intent" after intent
+        analysis, "card" after a create/update attempt, "token" for each
+        response chunk, and finally "done" with the same payload as process_message.
+        """
+        initial_state = self._initial_state(user_message, session_id, focused_card)
+        
+        print(f"\n=== Streaming: '{user_message}' ===")
         
+        final_state = dict(initial_state)
+        async for mode, chunk in self.graph.astream(initial_state, stream_mode=["updates", "custom"]):
+            for event in self._stream_events(mode, chunk, final_state):
+                yield event
+        
+        yield "done", self._result_from_state(final_state)
+    
+    def _initial_state(self, user_message: str, session_id: Optional[str], focused_card: Optional[dict]) -> ConversationState:
+        return {
+            "user_message": user_message,
+            "session_id": session_id,
+            "intent": None,
+            "confidence": None,
+            "reasoning": None,
+            "response": None,
+            "card_id": None,
+            "updated_card": None,
+            "focused_card": focused_card,  # Set focused card from parameter
+            "prefetched_cards": None,
+            "pending_focused_card": None
+        }
+    
+    def _stream_events(self, mode: str, chunk: dict, final_state: dict):
+        """Map one graph.astream() item to (event, data) pairs, folding node updates into final_state"""
+        if mode == "custom":
+            if "token" in chunk:
+                yield "token", {"text": chunk["token"]}
+            return
+        
+        for node, update in chunk.items():
+            if update:
+                final_state.update(update)
+            
+            if node == "load_session":
+                yield "session", {"session_id": final_state.get("session_id")}
+            elif node == "analyze_intent":
+                yield "intent", {
+                    "intent": final_state.get("intent"),
+                    "confidence": final_state.get("confidence"),
+                    "reasoning": final_state.get("reasoning")
+                }
+            elif node in ("create_card", "update_card"):
+                yield "card", {
+                    "card_id": final_state.get("card_id"),
+                    "updated_card": final_state.get("updated_card"),
+                    "response": final_state.get("response")
+                }
+    
+    def _result_from_state(self, final_state: dict) -> dict:
         return {
             "user_message": final_state["user_message"],
             "session_id": final_state.get("session_id"),
@@ -543,34 +852,42 @@ Keep it conversational and concise."""
             "focused_card": final_state.get("focused_card")
         }
     
-    def get_session_history(self, session_id: str, limit: int = 10) -> list:
+    async def get_session_history(self, session_id: str, limit: int = 10) -> list:
         """Get conversation history for a session"""
         if not self.use_redis or not self.state_manager:
             return []
         
-        return self.state_manager.get_conversation_history(session_id, limit)
+        return await self.state_manager.get_conversation_history(session_id, limit)
+    
+    async def get_session_history_page(self, session_id: str, limit: int = 10, cursor: Optional[str] = None) -> tuple:
+        """One page of history, oldest first, plus the cursor for the page before it"""
+        if not self.use_redis or not self.state_manager:
+            return [], None
+        
+        return await self.state_manager.get_conversation_history_page(session_id, limit, cursor)
     
-    def set_focused_card(self, session_id: str, card_data: dict) -> bool:
+    async def set_focused_card(self, session_id: str, card_data: dict) -> bool:
         """Set the focused card for a session"""
         if not self.use_redis or not self.state_manager:
             return False
         
-        return self.state_manager.save_focused_card(session_id, card_data)
+        return await self.state_manager.save_focused_card(session_id, card_data)
     
-    def clear_focused_card(self, session_id: str) -> bool:
+    async def clear_focused_card(self, session_id: str) -> bool:
         """Clear the focused card for a session"""
         if not self.use_redis or not self.state_manager:
             return False
         
-        return self.state_manager.clear_focused_card(session_id)
+        return await self.state_manager.clear_focused_card(session_id)
 
 # Test the workflow
-if __name__ == "__main__":
+async def main():
     workflow = ConversationalWorkflow()
+    await workflow.init()
     
     # Test basic workflow
     print("Testing basic workflow...")
-    result1 = workflow.process_message("What is machine learning?")
+    result1 = await workflow.process_message("What is machine learning?")
     print(f"Response: {result1['response'][:100]}...")
     
     # Test with session continuity
@@ -579,20 +896,25 @@ if __name__ == "__main__":
         session_id = result1.get("session_id")
         
         # Continue conversation in same session
-        result2 = workflow.process_message(
+        result2 = await workflow.process_message(
             "Create a card about neural networks", 
             session_id=session_id
         )
         print(f"Response: {result2['response'][:100]}...")
         
         # Get conversation history
-        history = workflow.get_session_history(session_id)
+        history = await workflow.get_session_history(session_id)
         print(f"\nConversation history: {len(history)} messages")
         for i, msg in enumerate(history, 1):
             print(f"{i}. {msg['user_message']} -> {msg['intent']}")
     else:
         print("Redis not available - testing without session persistence")
-        result2 = workflow.process_message("Create a card about neural networks")
+        result2 = await workflow.process_message("Create a card about neural networks")
         print(f"Response: {result2['response'][:100]}...")
     
-    print("\n" + "="*60)
\ No newline at end of file
+    print("\n" + "="*60)
+    
+    await workflow.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
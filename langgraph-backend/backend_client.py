@@ -0,0 +1,136 @@
+"""Pooled HTTP client for the workflow's calls to the backend service.
+
+One client per workflow keeps connections to the backend alive across
+requests. Every call has a timeout. Idempotent calls are retried a bounded
+number of times with jittered exponential backoff. Latency, errors and
+retries are recorded per route in the Prometheus metrics, which GET
+/backend/stats summarizes. Each call is traced and carries a traceparent
+header, so the backend's spans join the caller's trace.
+"""
+from typing import Optional
+import asyncio
+import httpx
+import os
+import random
+import re
+import time
+
+from metrics import backend_call_stats, observe_backend_call
+from tracing import backend_span, record_backend_response, trace_headers
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Gateway errors from nginx/Kubernetes while a backend pod restarts
+RETRY_STATUSES = {502, 503, 504}
+
+ROUTE_ID_PATTERN = re.compile(r"/\d+(?=/|$)")
+
+
+def backend_client_settings() -> dict:
+    """Pool, timeout and retry settings, overridable through BACKEND_* environment variables"""
+    return {
+        "max_connections": int(os.getenv("BACKEND_MAX_CONNECTIONS", "20")),
+        "max_keepalive": int(os.getenv("BACKEND_MAX_KEEPALIVE", "10")),
+        "keepalive_expiry": float(os.getenv("BACKEND_KEEPALIVE_EXPIRY", "30")),
+        "connect_timeout": float(os.getenv("BACKEND_CONNECT_TIMEOUT", "2")),
+        "timeout": float(os.getenv("BACKEND_TIMEOUT", "30")),
+        "generate_timeout": float(os.getenv("BACKEND_GENERATE_TIMEOUT", "120")),
+        "retries": int(os.getenv("BACKEND_RETRIES", "2")),
+        "retry_backoff": float(os.getenv("BACKEND_RETRY_BACKOFF", "0.2"))
+    }
+
+
+def route_name(method: str, path: str) -> str:
+    """Metrics key with numeric path segments collapsed, e.g. "PUT /cards/{id}" """
+    return f"{method} {ROUTE_ID_PATTERN.sub('/{id}', path)}"
+
+
+class BackendClient:
+    """Keep-alive httpx.AsyncClient for the backend API; raises httpx.HTTPError when a call finally fails"""
+
+    def __init__(self, base_url: str, settings: Optional[dict] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.settings = settings or backend_client_settings()
+        self.generate_timeout = self.settings["generate_timeout"]
+        self.http = httpx.AsyncClient(transport=transport, **self._client_options())
+
+    def _client_options(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "headers": {"Content-Type": "application/json"},
+            "timeout": httpx.Timeout(self.settings["timeout"], connect=self.settings["connect_timeout"]),
+            "limits": httpx.Limits(
+                max_connections=self.settings["max_connections"],
+                max_keepalive_connections=self.settings["max_keepalive"],
+                keepalive_expiry=self.settings["keepalive_expiry"]
+            )
+        }
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", path, **kwargs)
+
+    async def request(self, method: str, path: str, json=None, params=None, timeout: Optional[float] = None,
+                      idempotent: Optional[bool] = None) -> httpx.Response:
+        """Send one call, retrying transport errors and gateway statuses when the call is idempotent.
+
+        idempotent defaults from the method; pass True for read-only POSTs such as /search.
+        """
+        with backend_span(method, path, route_name(method, path)):
+            return await self._send(method, path, json, params, timeout, idempotent)
+
+    async def _send(self, method: str, path: str, json, params, timeout: Optional[float], idempotent: Optional[bool]) -> httpx.Response:
+        retryable = self._retryable(method, idempotent)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = await self.http.request(method, path, json=json, params=params, timeout=self._timeout(timeout), headers=trace_headers())
+            except httpx.TransportError:
+                if not self._should_retry(retryable, attempt):
+                    self._record(method, path, started, False, attempt)
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or not self._should_retry(retryable, attempt):
+                    self._record(method, path, started, response.status_code < 500, attempt)
+                    record_backend_response(response.status_code, attempt)
+                    return response
+                await response.aclose()
+
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "routes": backend_call_stats()
+        }
+
+    async def close(self) -> None:
+        await self.http.aclose()
+
+    def _retryable(self, method: str, idempotent: Optional[bool]) -> bool:
+        return method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+
+    def _should_retry(self, retryable: bool, attempt: int) -> bool:
+        return retryable and attempt < self.settings["retries"]
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spread retries from many workers instead of synchronizing them
+        return random.uniform(0, self.settings["retry_backoff"] * (2 ** attempt))
+
+    def _timeout(self, timeout: Optional[float]):
+        if timeout is None:
+            return httpx.USE_CLIENT_DEFAULT
+        return httpx.Timeout(timeout, connect=self.settings["connect_timeout"])
+
+    def _record(self, method: str, path: str, started: float, ok: bool, retries: int) -> None:
+        observe_backend_call(route_name(method, path), time.perf_counter() - started, ok, retries)
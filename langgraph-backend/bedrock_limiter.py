@@ -0,0 +1,278 @@
+"""Client-side rate and concurrency limits for Bedrock, per model.
+
+Each model gets a token bucket, which caps the request rate, and an AIMD
+concurrency limit. The limit grows by about one slot per window of
+successful calls and halves when Bedrock throttles. Throttled and transiently
+failed calls are retried with jittered exponential backoff. A call that still
+fails raises a typed error instead of returning an empty result:
+BedrockThrottledError when retries ran out, BedrockError otherwise. A
+response stream keeps its concurrency slot until it is drained or closed.
+"""
+from typing import Optional
+import asyncio
+import os
+import random
+import time
+
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, ReadTimeoutError
+
+# Throttling: the account quota is exhausted; back off and shrink concurrency
+THROTTLE_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException"}
+# Transient service-side failures, retried without counting as congestion
+TRANSIENT_CODES = {"ServiceUnavailableException", "ModelNotReadyException", "InternalServerException", "ModelTimeoutException"}
+
+# botocore's own retries would hide throttles from the limiter
+BEDROCK_CLIENT_CONFIG = Config(retries={"mode": "standard", "total_max_attempts": 1})
+
+
+class BedrockError(Exception):
+    """A Bedrock call failed and retrying would not help, or the reply was unusable"""
+
+    def __init__(self, model_id: str, message: str, code: Optional[str] = None):
+        super().__init__(f"Bedrock {model_id}: {message}")
+        self.model_id = model_id
+        self.code = code
+
+
+class BedrockThrottledError(BedrockError):
+    """Bedrock kept throttling (or was unavailable) through every retry"""
+
+
+def error_code(error: Exception) -> Optional[str]:
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code")
+    return None
+
+
+def classify(error: Exception) -> Optional[str]:
+    """"throttle", "transient", or None for errors that retrying won't fix"""
+    code = error_code(error)
+    if code:
+        # Errors inside a response stream are named like "throttlingException"
+        code = code[0].upper() + code[1:]
+    if code in THROTTLE_CODES:
+        return "throttle"
+    if code in TRANSIENT_CODES or isinstance(error, (BotoConnectionError, ReadTimeoutError)):
+        return "transient"
+    return None
+
+
+def parse_model_rates(spec: str) -> dict:
+    """ "amazon.titan-embed-text-v2:0=30,anthropic.claude-3-haiku-20240307-v1:0=8" -> {model: rate} """
+    rates = {}
+    for item in spec.split(","):
+        model_id, _, rate = item.strip().rpartition("=")
+        if model_id:
+            rates[model_id] = float(rate)
+    return rates
+
+
+class TokenBucket:
+    """Allows rate calls per second with bursts of up to burst; rate <= 0 means unlimited"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while (wait := self._take()) > 0:
+            await asyncio.sleep(wait)
+
+    def _take(self) -> float:
+        """Take a token and return 0, or return how long to wait before trying again"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AIMDConcurrency:
+    """Concurrency limit that grows additively on success and shrinks multiplicatively on throttles.
+
+    A burst of throttles from calls started under the same limit counts as one
+    congestion signal: release() only shrinks the limit when the call's epoch
+    is current. For one event loop; acquire and release are coroutines.
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 64, decrease: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self.epoch = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> int:
+        async with self._condition:
+            await self._condition.wait_for(self._has_slot)
+            self.in_flight += 1
+            return self.epoch
+
+    async def release(self, epoch: int, congested: bool) -> None:
+        async with self._condition:
+            self._adjust(epoch, congested)
+            self._condition.notify_all()
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _adjust(self, epoch: int, congested: bool) -> None:
+        self.in_flight -= 1
+        if not congested:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        elif epoch == self.epoch:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self.epoch += 1
+
+
+class ModelLimit:
+    def __init__(self, bucket: TokenBucket, concurrency: AIMDConcurrency):
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.counts = {"calls": 0, "throttles": 0, "transient_errors": 0, "retries": 0, "failures": 0}
+
+    def stats(self) -> dict:
+        return {
+            **self.counts,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "rate_limit": self.bucket.rate if self.bucket.rate > 0 else None
+        }
+
+
+class BedrockLimiter:
+    """Runs Bedrock coroutine calls under per-model limits on one event loop, retrying throttles.
+
+    Raises BedrockError subclasses.
+    """
+
+    def __init__(self, default_rate: float = 0, model_rates: Optional[dict] = None, initial_concurrency: int = 8,
+                 min_concurrency: int = 1, max_concurrency: int = 64, retries: int = 4,
+                 retry_backoff: float = 0.5, max_retry_backoff: float = 10):
+        self.default_rate = default_rate
+        self.model_rates = model_rates or {}
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._models = {}
+
+    async def call(self, model_id: str, fn):
+        """Return await fn(), waiting for a token and a concurrency slot first and retrying throttles"""
+        limit = self._model(model_id)
+        result, epoch = await self._run(limit, model_id, fn)
+        await limit.concurrency.release(epoch, congested=False)
+        self._count(limit, "calls")
+        return result
+
+    async def stream(self, model_id: str, open_stream):
+        """Yield the events of the response stream await open_stream() returns.
+
+        Opening is limited and retried as in call(), and the concurrency slot
+        is held until the stream is drained or closed. An error while reading
+        is not retried, since events were already yielded; it is raised as
+        BedrockThrottledError or BedrockError, and a throttle shrinks the limit.
+        """
+        limit = self._model(model_id)
+        response, epoch = await self._run(limit, model_id, open_stream)
+        congested = False
+        try:
+            async for event in response["body"]:
+                yield event
+        except Exception as e:
+            kind = classify(e)
+            congested = kind == "throttle"
+            raise self._stream_failure(limit, model_id, e, kind) from e
+        finally:
+            await limit.concurrency.release(epoch, congested=congested)
+        self._count(limit, "calls")
+
+    async def _run(self, limit: ModelLimit, model_id: str, fn):
+        """(await fn(), epoch of the concurrency slot it was run in); the caller releases the slot"""
+        attempt = 0
+        while True:
+            await limit.bucket.acquire()
+            epoch = await limit.concurrency.acquire()
+            try:
+                return await fn(), epoch
+            except asyncio.CancelledError:
+                await limit.concurrency.release(epoch, congested=False)
+                raise
+            except Exception as e:
+                kind = classify(e)
+                await limit.concurrency.release(epoch, congested=kind == "throttle")
+                delay = self._after_failure(limit, model_id, e, kind, attempt)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def stats(self) -> dict:
+        return {model_id: limit.stats() for model_id, limit in self._models.items()}
+
+    def _model(self, model_id: str) -> ModelLimit:
+        limit = self._models.get(model_id)
+        if limit is None:
+            limit = self._models[model_id] = ModelLimit(
+                TokenBucket(self.model_rates.get(model_id, self.default_rate)),
+                AIMDConcurrency(self.initial_concurrency, self.min_concurrency, self.max_concurrency)
+            )
+        return limit
+
+    def _after_failure(self, limit: ModelLimit, model_id: str, error: Exception, kind: Optional[str], attempt: int) -> float:
+        """Seconds to wait before retrying, or raise the typed error for this failure"""
+        if kind is None:
+            self._count(limit, "failures")
+            raise BedrockError(model_id, str(error), error_code(error)) from error
+        self._count(limit, "throttles" if kind == "throttle" else "transient_errors")
+        if attempt >= self.retries:
+            self._count(limit, "failures")
+            raise BedrockThrottledError(model_id, f"gave up after {attempt + 1} attempts: {error}", error_code(error)) from error
+        self._count(limit, "retries")
+        delay = self._backoff(attempt)
+        print(f"⚠ Bedrock {model_id} {kind} ({error_code(error) or type(error).__name__}), retrying in {delay:.2f}s")
+        return delay
+
+    def _stream_failure(self, limit: ModelLimit, model_id: str, error: Exception, kind: Optional[str]) -> BedrockError:
+        """The typed error for a stream that failed after it opened"""
+        self._count(limit, "failures")
+        if kind is None:
+            return BedrockError(model_id, f"stream failed: {error}", error_code(error))
+        self._count(limit, "throttles" if kind == "throttle" else "transient_errors")
+        print(f"✗ Bedrock {model_id} stream interrupted by {kind} ({error_code(error) or type(error).__name__})")
+        return BedrockThrottledError(model_id, f"stream interrupted: {error}", error_code(error))
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter, so throttled callers don't return in lockstep
+        return random.uniform(0, min(self.max_retry_backoff, self.retry_backoff * (2 ** attempt)))
+
+    def _count(self, limit: ModelLimit, name: str) -> None:
+        limit.counts[name] += 1
+
+
+def bedrock_limiter_settings() -> dict:
+    """Limiter settings, overridable through BEDROCK_* environment variables"""
+    return {
+        "default_rate": float(os.getenv("BEDROCK_RATE_LIMIT", "0")),
+        "model_rates": parse_model_rates(os.getenv("BEDROCK_MODEL_RATE_LIMITS", "")),
+        "initial_concurrency": int(os.getenv("BEDROCK_INITIAL_CONCURRENCY", "8")),
+        "min_concurrency": int(os.getenv("BEDROCK_MIN_CONCURRENCY", "1")),
+        "max_concurrency": int(os.getenv("BEDROCK_MAX_CONCURRENCY", "64")),
+        "retries": int(os.getenv("BEDROCK_RETRIES", "4")),
+        "retry_backoff": float(os.getenv("BEDROCK_RETRY_BACKOFF", "0.5")),
+        "max_retry_backoff": float(os.getenv("BEDROCK_RETRY_MAX_BACKOFF", "10"))
+    }
+
+
+def create_bedrock_limiter() -> BedrockLimiter:
+    return BedrockLimiter(**bedrock_limiter_settings())
+
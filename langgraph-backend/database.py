@@ -1,45 +1,140 @@
+from redis.backoff import ExponentialWithJitterBackoff
+from redis.asyncio.retry import Retry
+from metrics import instrument_redis
+import asyncio
+import os
 import redis
+import redis.asyncio as aioredis
+import re
+import time
+import uuid
 import json
 from typing import Optional, Dict, List, Any
 from datetime import datetime, timedelta
 
+HISTORY_CURSOR_PATTERN = re.compile(r"^\d+-\d+$")
+
+def history_key(session_id: str) -> str:
+    # Capped Redis stream; replaces the conversation_history:{id} JSON array
+    return f"conversation_messages:{session_id}"
+
+def history_page(entries: List[tuple], limit: int) -> tuple:
+    """Turn newest-first (entry_id, message) pairs fetched with limit+1 into (messages oldest first, next_cursor)"""
+    next_cursor = None
+    if limit > 0 and len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = entries[-1][0]
+    
+    messages = [{**message, "message_id": entry_id} for entry_id, message in reversed(entries)]
+    return messages, next_cursor
+
+def validate_history_cursor(cursor: Optional[str]) -> None:
+    if cursor is not None and not HISTORY_CURSOR_PATTERN.match(cursor):
+        raise ValueError("Invalid cursor")
+
+SESSION_INFO_FIELDS = ["session_id", "user_id", "created_at", "last_activity", "message_count"]
+
+ACTIVE_SESSIONS_KEY = "sessions:active"  # Sorted set: session_id scored by last activity (epoch seconds)
+
+def encode_session_cursor(score: float, session_id: str) -> str:
+    return f"{score!r}|{session_id}"
+
+def decode_session_cursor(cursor: str) -> tuple:
+    try:
+        score, session_id = cursor.split("|", 1)
+        return float(score), session_id
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+def json_field(value: Optional[str]) -> Any:
+    return json.loads(value) if value else None
+
+def is_legacy_session_error(error: Exception) -> bool:
+    # session:{id} held a JSON string before sessions became hashes
+    return "WRONGTYPE" in str(error)
+
+def legacy_session_keys(session_id: str) -> List[str]:
+    """String keys a session used before it became one hash: metadata, state, focused card, JSON history"""
+    return [f"session:{session_id}", f"conversation_state:{session_id}",
+            f"focused_card:{session_id}", f"conversation_history:{session_id}"]
+
+def redis_pool_settings() -> dict:
+    """Connection pool settings, overridable through REDIS_* environment variables"""
+    return {
+        "max_connections": int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+        "pool_timeout": float(os.getenv("REDIS_POOL_TIMEOUT", "5")),
+        "socket_timeout": float(os.getenv("REDIS_SOCKET_TIMEOUT", "2")),
+        "socket_connect_timeout": float(os.getenv("REDIS_CONNECT_TIMEOUT", "2")),
+        "health_check_interval": int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")),
+        "retries": int(os.getenv("REDIS_RETRIES", "3"))
+    }
+
+def _connection_kwargs(settings: dict, retry_class) -> dict:
+    # The Retry default covers ConnectionError and TimeoutError, i.e. retry-on-timeout
+    return {
+        "socket_timeout": settings["socket_timeout"],
+        "socket_connect_timeout": settings["socket_connect_timeout"],
+        "socket_keepalive": True,
+        "health_check_interval": settings["health_check_interval"],
+        "retry": retry_class(ExponentialWithJitterBackoff(base=0.05, cap=1.0), settings["retries"])
+    }
+
+def connection_pool(host: str, port: int, db: int = 0, decode_responses: bool = True) -> aioredis.BlockingConnectionPool:
+    """A blocking redis.asyncio pool for one Redis endpoint, bound to the event loop that first uses it.
+    
+    Blocking (rather than growing) pools make callers wait up to pool_timeout
+    for a free connection instead of opening a new socket per burst.
+    """
+    settings = redis_pool_settings()
+    return aioredis.BlockingConnectionPool(
+        host=host,
+        port=port,
+        db=db,
+        decode_responses=decode_responses,
+        max_connections=settings["max_connections"],
+        timeout=settings["pool_timeout"],
+        **_connection_kwargs(settings, Retry)
+    )
+
 class RedisManager:
-    def __init__(self, host="langgraph-service", port=6379, db=0, decode_responses=True):
-        """Initialize Redis connection"""
+    """Redis client on redis.asyncio; construct, then await connect() (or use create_database_manager)"""
+    def __init__(self, host="langgraph-service", port=6379, db=0, decode_responses=True, pool: Optional[aioredis.ConnectionPool] = None):
+        """Initialize a Redis client on a pool for this endpoint"""
         self.host = host
         self.port = port
         self.db = db
-        self.client = redis.Redis(
-            host=host, 
-            port=port, 
-            db=db, 
-            decode_responses=decode_responses
-        )
-        
-        # Test connection
+        self.pool = pool or connection_pool(host, port, db, decode_responses)
+        self.client = instrument_redis(aioredis.Redis(connection_pool=self.pool))
+    
+    async def connect(self) -> None:
+        """Test the connection"""
         try:
-            self.client.ping()
-            print(f"✓ Connected to Redis at {host}:{port}")
+            await self.client.ping()
+            print(f"✓ Connected to Redis at {self.host}:{self.port} (pool of {self.pool.max_connections})")
         except redis.ConnectionError as e:
             print(f"✗ Failed to connect to Redis: {e}")
             raise
     
-    def set_json(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+    async def close(self) -> None:
+        await self.client.aclose()
+        await self.pool.disconnect()
+    
+    async def set_json(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """Store JSON data in Redis with optional TTL"""
         try:
             json_data = json.dumps(value)
             if ttl:
-                return self.client.setex(key, ttl, json_data)
+                return await self.client.setex(key, ttl, json_data)
             else:
-                return self.client.set(key, json_data)
+                return await self.client.set(key, json_data)
         except Exception as e:
             print(f"Error storing JSON data: {e}")
             return False
     
-    def get_json(self, key: str, default: Any = None) -> Any:
+    async def get_json(self, key: str, default: Any = None) -> Any:
         """Retrieve and parse JSON data from Redis"""
         try:
-            data = self.client.get(key)
+            data = await self.client.get(key)
             if data is None:
                 return default
             return json.loads(data)
@@ -47,156 +142,398 @@ class RedisManager:
             print(f"Error retrieving JSON data: {e}")
             return default
     
-    def delete(self, key: str) -> bool:
+    async def delete(self, key: str) -> bool:
         """Delete a key from Redis"""
         try:
-            return bool(self.client.delete(key))
+            return bool(await self.client.delete(key))
         except Exception as e:
             print(f"Error deleting key: {e}")
             return False
     
-    def exists(self, key: str) -> bool:
+    async def exists(self, key: str) -> bool:
         """Check if a key exists in Redis"""
         try:
-            return bool(self.client.exists(key))
+            return bool(await self.client.exists(key))
         except Exception as e:
             print(f"Error checking key existence: {e}")
             return False
+    
+    async def append_json(self, key: str, value: Any, maxlen: int, ttl: Optional[int] = None) -> bool:
+        """Append to a capped stream: XADD trims to maxlen in the same command; EXPIRE rides the same round trip"""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.xadd(key, {"data": json.dumps(value)}, maxlen=maxlen, approximate=False)
+            if ttl:
+                pipe.expire(key, ttl)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Error appending JSON data: {e}")
+            return False
+    
+    async def read_json_range(self, key: str, count: Optional[int] = None, before: Optional[str] = None) -> List[tuple]:
+        """Newest-first (entry_id, value) pairs from a stream, optionally strictly older than entry id `before`"""
+        try:
+            entries = await self.client.xrevrange(key, max=f"({before}" if before else "+", min="-", count=count)
+            return [(entry_id, json.loads(fields["data"])) for entry_id, fields in entries]
+        except Exception as e:
+            print(f"Error reading JSON range: {e}")
+            return []
 
 class ConversationStateManager:
+    """Session state in Redis.
+    
+    Each session is one hash, session:{id}, holding the session metadata
+    (session_id, user_id, created_at, last_activity, message_count) plus the
+    JSON-encoded conversation_state and focused_card fields, so a single TTL
+    keeps it all alive. History is a separate capped stream (see history_key)
+    with its own, longer retention.
+    """
     def __init__(self, redis_manager: RedisManager):
         """Initialize conversation state management"""
         self.redis = redis_manager
         self.session_ttl = 3600  # 1 hour session timeout
         self.history_ttl = 86400  # 24 hours history retention
+        self.history_max_messages = 50  # Older messages are trimmed on append
     
-    def save_conversation_state(self, session_id: str, state: Dict[str, Any]) -> bool:
-        """Save conversation state for a session"""
-        key = f"conversation_state:{session_id}"
-        
-        # Add timestamp
-        state_with_timestamp = {
+    def _session_key(self, session_id: str) -> str:
+        return f"session:{session_id}"
+    
+    def _conversation_state_record(self, session_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
             **state,
             "last_updated": datetime.now().isoformat(),
             "session_id": session_id
         }
-        
-        return self.redis.set_json(key, state_with_timestamp, ttl=self.session_ttl)
-    
-    def load_conversation_state(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Load conversation state for a session"""
-        key = f"conversation_state:{session_id}"
-        return self.redis.get_json(key)
     
-    def save_focused_card(self, session_id: str, card_data: Dict[str, Any]) -> bool:
-        """Save the currently focused card for a session"""
-        key = f"focused_card:{session_id}"
-        
-        focused_card_data = {
+    def _focused_card_record(self, session_id: str, card_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
             **card_data,
             "focused_at": datetime.now().isoformat(),
             "session_id": session_id
         }
-        
-        return self.redis.set_json(key, focused_card_data, ttl=self.session_ttl)
     
-    def load_focused_card(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Load the currently focused card for a session"""
-        key = f"focused_card:{session_id}"
-        return self.redis.get_json(key)
+    def _history_record(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **message,
+            "timestamp": datetime.now().isoformat()
+        }
     
-    def clear_focused_card(self, session_id: str) -> bool:
-        """Clear the focused card for a session"""
-        key = f"focused_card:{session_id}"
-        return self.redis.delete(key)
+    def _session_info(self, fields: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        info = {field: fields.get(field) for field in SESSION_INFO_FIELDS}
+        info["message_count"] = int(info["message_count"] or 0)
+        return info
     
-    def add_message_to_history(self, session_id: str, message: Dict[str, Any]) -> bool:
-        """Add a message to conversation history"""
-        history_key = f"conversation_history:{session_id}"
-        
-        # Get existing history
-        history = self.redis.get_json(history_key, [])
+    def _loaded_session(self, fields: Dict[str, str]) -> Dict[str, Any]:
+        """Split a session hash into its conversation state, focused card and metadata"""
+        if not fields:
+            return {"conversation_state": None, "focused_card": None, "session": None}
+        return {
+            "conversation_state": json_field(fields.get("conversation_state")),
+            "focused_card": json_field(fields.get("focused_card")),
+            "session": self._session_info(fields)
+        }
+    
+    def _queue_session_update(self, pipe, session_id: str, fields: Dict[str, Any], turns: int = 0) -> None:
+        """Queue per-field writes, an atomic message_count increment, the one TTL refresh and the activity index bump"""
+        key = self._session_key(session_id)
+        pipe.hset(key, mapping=fields)
+        if turns:
+            pipe.hincrby(key, "message_count", turns)
+        pipe.expire(key, self.session_ttl)
+        pipe.zadd(ACTIVE_SESSIONS_KEY, {session_id: time.time()})
+    
+    def _active_since(self) -> float:
+        """Oldest index score whose session hash can still be alive"""
+        return time.time() - self.session_ttl
+    
+    def _queue_active_page(self, pipe, limit: int, cursor: Optional[str]) -> None:
+        """Queue the index reads for one page, newest activity first: [ties at the cursor score], next entries, total"""
+        since = self._active_since()
+        max_score = "+inf"
+        if cursor:
+            cursor_score, _ = decode_session_cursor(cursor)
+            pipe.zrevrangebyscore(ACTIVE_SESSIONS_KEY, cursor_score, cursor_score, withscores=True)
+            max_score = f"({cursor_score!r}"
+        pipe.zrevrangebyscore(ACTIVE_SESSIONS_KEY, max_score, since, start=0, num=limit + 1, withscores=True)
+        pipe.zcount(ACTIVE_SESSIONS_KEY, since, "+inf")
+    
+    def _active_page_ids(self, results: list, limit: int, cursor: Optional[str]) -> tuple:
+        """(session_ids, next_cursor, total) from the _queue_active_page results"""
+        entries = results[-2]
+        if cursor:
+            # Members sharing the cursor's score come in descending order; earlier pages hold those >= its id
+            _, cursor_id = decode_session_cursor(cursor)
+            entries = [entry for entry in results[0] if entry[0] < cursor_id] + entries
         
-        # Add new message with timestamp
-        message_with_timestamp = {
-            **message,
-            "timestamp": datetime.now().isoformat()
+        page = entries[:limit]
+        next_cursor = encode_session_cursor(page[-1][1], page[-1][0]) if len(entries) > limit else None
+        return [member for member, _ in page], next_cursor, results[-1]
+    
+    def _active_page_details(self, session_ids: List[str], values: List[list]) -> List[Dict[str, Any]]:
+        details = []
+        for session_id, fields in zip(session_ids, values):
+            if any(fields):  # Skip hashes that expired before the sweeper caught up
+                details.append(self._session_info(dict(zip(SESSION_INFO_FIELDS, fields))))
+        return details
+    
+    def _queue_new_session(self, pipe, session_id: str, user_id: Optional[str] = None) -> None:
+        now = datetime.now().isoformat()
+        fields = {"session_id": session_id, "created_at": now, "last_activity": now, "message_count": 0}
+        if user_id is not None:
+            fields["user_id"] = user_id
+        self._queue_session_update(pipe, session_id, fields)
+    
+    def _queue_turn_commit(self, pipe, session_id: str, conversation_state: Dict[str, Any], message: Dict[str, Any],
+                           focused_card: Optional[Dict[str, Any]]) -> None:
+        """Queue every write for one turn on a pipeline (queuing never blocks)"""
+        now = datetime.now().isoformat()
+        fields = {
+            "session_id": session_id,
+            "last_activity": now,
+            "conversation_state": json.dumps(self._conversation_state_record(session_id, conversation_state))
         }
+        if focused_card:
+            fields["focused_card"] = json.dumps(self._focused_card_record(session_id, focused_card))
         
-        history.append(message_with_timestamp)
+        pipe.hsetnx(self._session_key(session_id), "created_at", now)
+        self._queue_session_update(pipe, session_id, fields, turns=1)
+        pipe.xadd(history_key(session_id), {"data": json.dumps(self._history_record(message))},
+                  maxlen=self.history_max_messages, approximate=False)
+        pipe.expire(history_key(session_id), self.history_ttl)
+    
+    async def _execute(self, pipe, action: str) -> bool:
+        try:
+            await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Error {action}: {e}")
+            return False
+    
+    async def load_session(self, session_id: str) -> Dict[str, Any]:
+        """Conversation state, focused card and session metadata in one round trip (HGETALL).
         
-        # Keep only last 50 messages to prevent unlimited growth
-        history = history[-50:]
+        A session written before sessions became hashes is migrated on this first read.
+        """
+        try:
+            return self._loaded_session(await self.redis.client.hgetall(self._session_key(session_id)))
+        except redis.ResponseError as e:
+            if is_legacy_session_error(e):
+                return self._loaded_session(await self._migrate_legacy_session(session_id))
+            print(f"Error loading session: {e}")
+        except Exception as e:
+            print(f"Error loading session: {e}")
+        return self._loaded_session({})
+    
+    async def _migrate_legacy_session(self, session_id: str) -> Dict[str, str]:
+        """Move a session stored as separate JSON strings into its hash and history stream; returns the hash fields.
         
-        return self.redis.set_json(history_key, history, ttl=self.history_ttl)
+        WATCH on session:{id} makes concurrent first reads migrate it once;
+        a reader that loses the race reads the hash the winner wrote.
+        """
+        key = self._session_key(session_id)
+        try:
+            async with self.redis.client.pipeline(transaction=True) as pipe:
+                await pipe.watch(key)
+                info, state, card, history = await pipe.mget(legacy_session_keys(session_id))
+                stream_length = await pipe.xlen(history_key(session_id))
+                fields = self._legacy_session_fields(session_id, json_field(info) or {}, state, card)
+                pipe.multi()
+                pipe.delete(*legacy_session_keys(session_id))
+                self._queue_session_update(pipe, session_id, fields)
+                if history and not stream_length:
+                    self._queue_legacy_history(pipe, session_id, json.loads(history))
+                await pipe.execute()
+            print(f"✓ Migrated legacy session {session_id[:8]}...")
+            return fields
+        except redis.WatchError:
+            return await self.redis.client.hgetall(key)
+        except Exception as e:
+            print(f"Error migrating legacy session: {e}")
+            return {}
+    
+    def _legacy_session_fields(self, session_id: str, info: Dict[str, Any], state: Optional[str], card: Optional[str]) -> Dict[str, str]:
+        now = datetime.now().isoformat()
+        fields = {
+            "session_id": session_id,
+            "created_at": info.get("created_at") or now,
+            "last_activity": info.get("last_activity") or now,
+            "message_count": str(info.get("message_count") or 0)
+        }
+        if info.get("user_id") is not None:
+            fields["user_id"] = info["user_id"]
+        # Both were stored as the same JSON records the hash fields hold
+        if state:
+            fields["conversation_state"] = state
+        if card:
+            fields["focused_card"] = card
+        return fields
     
-    def get_conversation_history(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get conversation history for a session"""
-        history_key = f"conversation_history:{session_id}"
-        history = self.redis.get_json(history_key, [])
+    def _queue_legacy_history(self, pipe, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        for message in messages[-self.history_max_messages:]:
+            pipe.xadd(history_key(session_id), {"data": json.dumps(message)},
+                      maxlen=self.history_max_messages, approximate=False)
+        pipe.expire(history_key(session_id), self.history_ttl)
+    
+    async def commit_turn(self, session_id: str, conversation_state: Dict[str, Any], message: Dict[str, Any],
+                    focused_card: Optional[Dict[str, Any]] = None) -> bool:
+        """Persist one turn in a single MULTI/EXEC round trip.
         
-        # Return the most recent messages
-        return history[-limit:] if limit > 0 else history
+        Updates the session hash (conversation state, last activity, message
+        count, and focused_card if it changed this turn), refreshes its TTL and
+        appends the message to history. The hash is created on a session's first turn.
+        """
+        pipe = self.redis.client.pipeline(transaction=True)
+        self._queue_turn_commit(pipe, session_id, conversation_state, message, focused_card)
+        return await self._execute(pipe, "committing turn")
+    
+    async def save_conversation_state(self, session_id: str, state: Dict[str, Any]) -> bool:
+        """Save conversation state for a session"""
+        pipe = self.redis.client.pipeline(transaction=True)
+        self._queue_session_update(pipe, session_id, {
+            "conversation_state": json.dumps(self._conversation_state_record(session_id, state))
+        })
+        return await self._execute(pipe, "saving conversation state")
+    
+    async def load_conversation_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Load conversation state for a session"""
+        return await self._load_field(session_id, "conversation_state")
+    
+    async def save_focused_card(self, session_id: str, card_data: Dict[str, Any]) -> bool:
+        """Save the currently focused card for a session"""
+        pipe = self.redis.client.pipeline(transaction=True)
+        self._queue_session_update(pipe, session_id, {
+            "focused_card": json.dumps(self._focused_card_record(session_id, card_data))
+        })
+        return await self._execute(pipe, "saving focused card")
+    
+    async def load_focused_card(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Load the currently focused card for a session"""
+        return await self._load_field(session_id, "focused_card")
+    
+    async def clear_focused_card(self, session_id: str) -> bool:
+        """Clear the focused card for a session"""
+        try:
+            return bool(await self.redis.client.hdel(self._session_key(session_id), "focused_card"))
+        except Exception as e:
+            print(f"Error clearing focused card: {e}")
+            return False
     
-    def clear_conversation_history(self, session_id: str) -> bool:
+    async def _load_field(self, session_id: str, field: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json_field(await self.redis.client.hget(self._session_key(session_id), field))
+        except Exception as e:
+            print(f"Error loading {field}: {e}")
+            return None
+    
+    async def add_message_to_history(self, session_id: str, message: Dict[str, Any]) -> bool:
+        """Add a message to conversation history"""
+        return await self.redis.append_json(
+            history_key(session_id), self._history_record(message),
+            maxlen=self.history_max_messages, ttl=self.history_ttl
+        )
+    
+    async def get_conversation_history(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the most recent messages for a session, oldest first"""
+        return (await self.get_conversation_history_page(session_id, limit))[0]
+    
+    async def get_conversation_history_page(self, session_id: str, limit: int = 10, cursor: Optional[str] = None) -> tuple:
+        """One page of history walking backwards from the newest message.
+        
+        Returns (messages oldest first, next_cursor); pass next_cursor back to
+        get the page of older messages. next_cursor is None on the last page.
+        """
+        entries = await self.redis.read_json_range(history_key(session_id), count=limit + 1 if limit > 0 else None, before=cursor)
+        return history_page(entries, limit)
+    
+    async def clear_conversation_history(self, session_id: str) -> bool:
         """Clear conversation history for a session"""
-        history_key = f"conversation_history:{session_id}"
-        return self.redis.delete(history_key)
+        return await self.redis.delete(history_key(session_id))
     
-    def create_new_session(self, user_id: Optional[str] = None) -> str:
+    async def create_new_session(self, user_id: Optional[str] = None) -> str:
         """Create a new conversation session"""
-        import uuid
-        
         session_id = str(uuid.uuid4())
         
-        # Initialize session data
-        session_data = {
-            "session_id": session_id,
-            "user_id": user_id,
-            "created_at": datetime.now().isoformat(),
-            "last_activity": datetime.now().isoformat(),
-            "message_count": 0
-        }
-        
-        session_key = f"session:{session_id}"
-        self.redis.set_json(session_key, session_data, ttl=self.session_ttl)
+        pipe = self.redis.client.pipeline(transaction=True)
+        self._queue_new_session(pipe, session_id, user_id)
+        await self._execute(pipe, "creating session")
         
         return session_id
     
-    def update_session_activity(self, session_id: str) -> bool:
+    async def update_session_activity(self, session_id: str) -> bool:
         """Update last activity timestamp for a session"""
-        session_key = f"session:{session_id}"
-        session_data = self.redis.get_json(session_key)
-        
-        if session_data:
-            session_data["last_activity"] = datetime.now().isoformat()
-            session_data["message_count"] = session_data.get("message_count", 0) + 1
-            return self.redis.set_json(session_key, session_data, ttl=self.session_ttl)
+        if not await self.redis.exists(self._session_key(session_id)):
+            return False
         
-        return False
+        pipe = self.redis.client.pipeline(transaction=True)
+        self._queue_session_update(pipe, session_id, {"last_activity": datetime.now().isoformat()}, turns=1)
+        return await self._execute(pipe, "updating session activity")
     
-    def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
+    async def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session information"""
-        session_key = f"session:{session_id}"
-        return self.redis.get_json(session_key)
+        try:
+            values = await self.redis.client.hmget(self._session_key(session_id), SESSION_INFO_FIELDS)
+        except Exception as e:
+            print(f"Error getting session info: {e}")
+            return None
+        
+        if not any(values):
+            return None
+        return self._session_info(dict(zip(SESSION_INFO_FIELDS, values)))
     
-    def cleanup_expired_sessions(self) -> int:
-        """Cleanup expired sessions and related data"""
-        # This would typically be run as a background task
-        # For now, just return 0 as Redis TTL handles expiration
-        return 0
+    async def cleanup_expired_sessions(self) -> int:
+        """Prune sessions idle longer than the session TTL from the activity index.
+        
+        The session hashes themselves expire through their TTL; this keeps
+        the index from growing without bound.
+        """
+        try:
+            return await self.redis.client.zremrangebyscore(ACTIVE_SESSIONS_KEY, "-inf", f"({self._active_since()}")
+        except Exception as e:
+            print(f"Error pruning session index: {e}")
+            return 0
     
-    def get_active_sessions(self) -> List[str]:
-        """Get list of active session IDs"""
+    async def run_session_sweeper(self, interval: float = 60) -> None:
+        """Run cleanup_expired_sessions every interval seconds; run as a task and cancel on shutdown"""
+        while True:
+            await asyncio.sleep(interval)
+            removed = await self.cleanup_expired_sessions()
+            if removed:
+                print(f"✓ Pruned {removed} expired sessions from the index")
+    
+    async def get_active_sessions(self) -> List[str]:
+        """Get list of active session IDs, most recently active first"""
         try:
-            session_keys = self.redis.client.keys("session:*")
-            return [key.split(":", 1)[1] for key in session_keys]
+            return await self.redis.client.zrevrangebyscore(ACTIVE_SESSIONS_KEY, "+inf", self._active_since())
         except Exception as e:
             print(f"Error getting active sessions: {e}")
             return []
+    
+    async def get_active_sessions_page(self, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """One page of active sessions with their details, most recently active first.
+        
+        Two round trips regardless of index size: a range read of the index
+        (plus its count), then one pipelined HMGET per listed session.
+        Raises ValueError for a malformed cursor.
+        """
+        pipe = self.redis.client.pipeline(transaction=False)
+        self._queue_active_page(pipe, limit, cursor)
+        session_ids, next_cursor, total = self._active_page_ids(await pipe.execute(), limit, cursor)
+        
+        pipe = self.redis.client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hmget(self._session_key(session_id), SESSION_INFO_FIELDS)
+        values = await pipe.execute() if session_ids else []
+        
+        return {
+            "sessions": self._active_page_details(session_ids, values),
+            "total": total,
+            "next_cursor": next_cursor
+        }
 
 # Convenience function to create a database instance
-def create_database_manager(host="langraph-db-service", port=6379, db=0) -> ConversationStateManager:
-    """Create a conversation state manager with Redis backend"""
+async def create_database_manager(host="langraph-db-service", port=6379, db=0) -> ConversationStateManager:
+    """Create a conversation state manager with Redis backend; raises if Redis is unreachable"""
     redis_manager = RedisManager(host=host, port=port, db=db)
+    await redis_manager.connect()
     return ConversationStateManager(redis_manager)
@@ -0,0 +1,120 @@
+"""Offline evaluation of the local intent classifier against LLM labels.
+
+Reads an INTENT_LOG_PATH file (one JSON object per LLM-labeled message) and
+reports how many messages the fast path would decide, how often it agrees
+with the LLM, and how its latency compares.
+
+    python evaluate_intents.py intent_log.jsonl
+    python evaluate_intents.py intent_log.jsonl --model intent_model.json
+    python evaluate_intents.py intent_log.jsonl --save-model intent_model.json
+
+Without --model, a model is trained on a deterministic split of the log and
+evaluated on the held-out rest. --save-model trains on the whole log and
+writes the model that INTENT_MODEL_PATH loads.
+"""
+from collections import Counter
+from intent_classifier import INTENTS, IntentClassifier, KeywordRules, NaiveBayesIntentModel, read_intent_log
+import argparse
+import hashlib
+import time
+
+
+def is_held_out(message: str, test_fraction: float) -> bool:
+    """Stable train/test assignment, so reruns evaluate the same messages"""
+    bucket = int(hashlib.sha256(message.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return bucket < test_fraction
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def evaluate(classifier: IntentClassifier, rows: list) -> dict:
+    decided = correct = 0
+    by_stage = Counter()
+    confusion = Counter()
+    local_latencies = []
+    llm_latencies = [latency for _, _, _, latency in rows if latency is not None]
+
+    for message, has_focused_card, label, _ in rows:
+        started = time.perf_counter()
+        result = classifier.classify(message, {"focused": True} if has_focused_card else None)
+        local_latencies.append((time.perf_counter() - started) * 1000)
+
+        if result is None:
+            continue
+        decided += 1
+        by_stage[result["source"]] += 1
+        confusion[(label, result["intent"])] += 1
+        if result["intent"] == label:
+            correct += 1
+
+    return {
+        "messages": len(rows),
+        "decided_locally": decided,
+        "coverage": decided / len(rows) if rows else 0.0,
+        "accuracy": correct / decided if decided else 0.0,
+        "by_stage": dict(by_stage),
+        "confusion": confusion,
+        "local_p50_ms": percentile(local_latencies, 50),
+        "local_p95_ms": percentile(local_latencies, 95),
+        "llm_p50_ms": percentile(llm_latencies, 50),
+        "llm_p95_ms": percentile(llm_latencies, 95)
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"Messages evaluated:   {report['messages']}")
+    print(f"Decided locally:      {report['decided_locally']} ({report['coverage']:.1%} of LLM calls saved)")
+    print(f"Agreement with LLM:   {report['accuracy']:.1%}")
+    for stage, count in sorted(report["by_stage"].items()):
+        print(f"  via {stage}: {count}")
+
+    print(f"\nLatency (ms)          p50        p95")
+    print(f"  local             {report['local_p50_ms']:8.3f}   {report['local_p95_ms']:8.3f}")
+    print(f"  LLM (logged)      {report['llm_p50_ms']:8.1f}   {report['llm_p95_ms']:8.1f}")
+
+    print("\nConfusion (rows = LLM label, columns = local decision)")
+    print(" " * 12 + "".join(f"{intent:>12}" for intent in INTENTS))
+    for label in INTENTS:
+        print(f"{label:>12}" + "".join(f"{report['confusion'][(label, intent)]:>12}" for intent in INTENTS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local intent fast path against logged LLM labels")
+    parser.add_argument("log", help="Intent log written via INTENT_LOG_PATH")
+    parser.add_argument("--model", help="Evaluate this saved model instead of training on a split")
+    parser.add_argument("--save-model", help="Train on the whole log and save the model here")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--no-rules", action="store_true", help="Evaluate the model stage alone")
+    args = parser.parse_args()
+
+    rows = read_intent_log(args.log)
+    print(f"Loaded {len(rows)} labeled messages from {args.log}\n")
+
+    if args.save_model:
+        model = NaiveBayesIntentModel().train((m, f, i) for m, f, i, _ in rows)
+        model.save(args.save_model)
+        print(f"✓ Saved model trained on {len(rows)} messages to {args.save_model}")
+        return
+
+    if args.model:
+        model = NaiveBayesIntentModel.load(args.model)
+        test_rows = rows
+    else:
+        train_rows = [row for row in rows if not is_held_out(row[0], args.test_fraction)]
+        test_rows = [row for row in rows if is_held_out(row[0], args.test_fraction)]
+        model = NaiveBayesIntentModel().train((m, f, i) for m, f, i, _ in train_rows)
+        print(f"Trained on {len(train_rows)}, evaluating on {len(test_rows)} held-out messages\n")
+
+    stages = [model] if args.no_rules else [KeywordRules(), model]
+    print_report(evaluate(IntentClassifier(stages, threshold=args.threshold), test_rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Local fast-path intent classification in front of the LLM.
+
+An IntentClassifier runs cheap stages in order: keyword rules, then an
+optional naive Bayes model trained on intents the LLM labeled earlier (see
+IntentLog and evaluate_intents.py). The first stage that is confident enough
+decides the intent; otherwise classify() returns None and the caller asks the LLM.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Optional
+import json
+import math
+import os
+import re
+import threading
+
+INTENTS = ("NO_ACTION", "CREATE_NEW", "UPDATE")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(message: str, has_focused_card: bool = False) -> list:
+    """Lowercase word unigrams and bigrams, plus a marker when a card is focused"""
+    words = TOKEN_PATTERN.findall((message or "").lower())
+    tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if has_focused_card:
+        tokens.append("__focused_card__")
+    return tokens
+
+
+class KeywordRules:
+    """High-precision phrasings that need no model. Anything ambiguous is left to later stages."""
+    name = "rules"
+
+    CARD_VERBS = re.compile(r"\b(card|cards|create|add|save|update|edit|modify|change|revise|append|remember)\b")
+
+    RULES = [
+        ("CREATE_NEW", re.compile(
+            r"^\s*(please\s+)?(can you\s+)?(create|make|add|save|write)\s+(me\s+)?(a|an)\s+(new\s+)?(knowledge\s+)?card\b"
+        )),
+        ("CREATE_NEW", re.compile(r"\b(create|make|add|start)\s+(a\s+)?new\s+(knowledge\s+)?card\b")),
+        ("UPDATE", re.compile(
+            r"^\s*(please\s+)?(can you\s+)?(update|edit|modify|change|revise|fix)\s+(this|the|that|my|current|focused)\s+(knowledge\s+)?card\b"
+        )),
+        ("UPDATE", re.compile(r"\b(add|append)\s+(this|that|it)\s+to\s+(this|the|that|my|current|focused)\s+card\b")),
+    ]
+
+    QUESTION = re.compile(r"^\s*(what|why|how|when|who|where|which|is|are|does|do|can|could|explain|describe|tell me)\b")
+
+    def __init__(self, confidence: float = 0.95):
+        self.confidence = confidence
+
+    def predict(self, message: str, has_focused_card: bool = False) -> Optional[tuple]:
+        text = (message or "").lower()
+        for intent, pattern in self.RULES:
+            if pattern.search(text):
+                return intent, self.confidence
+
+        # Plain questions that mention no card operation are informational
+        if self.QUESTION.search(text) and text.rstrip().endswith("?") and not self.CARD_VERBS.search(text):
+            return "NO_ACTION", self.confidence
+
+        return None
+
+
+class NaiveBayesIntentModel:
+    """Multinomial naive Bayes over tokenize() features; small enough to train in-process."""
+    name = "model"
+
+    def __init__(self, alpha: float = 1.0, min_known_fraction: float = 0.5):
+        self.alpha = alpha
+        self.min_known_fraction = min_known_fraction
+        self.class_counts = Counter()
+        self.token_counts = defaultdict(Counter)
+        self.class_totals = Counter()
+        self.vocabulary = set()
+
+    def train(self, examples) -> "NaiveBayesIntentModel":
+        """examples: iterable of (message, has_focused_card, intent)"""
+        for message, has_focused_card, intent in examples:
+            if intent not in INTENTS:
+                continue
+            tokens = tokenize(message, has_focused_card)
+            self.class_counts[intent] += 1
+            self.token_counts[intent].update(tokens)
+            self.class_totals[intent] += len(tokens)
+            self.vocabulary.update(tokens)
+        return self
+
+    def predict(self, message: str, has_focused_card: bool = False) -> Optional[tuple]:
+        total = sum(self.class_counts.values())
+        if not total:
+            return None
+
+        tokens = tokenize(message, has_focused_card)
+        # Posteriors are overconfident on unfamiliar wording; leave those to the LLM
+        known = sum(1 for token in tokens if token in self.vocabulary)
+        if not tokens or known / len(tokens) < self.min_known_fraction:
+            return None
+
+        vocabulary_size = len(self.vocabulary) or 1
+        scores = {}
+        for intent, count in self.class_counts.items():
+            denominator = self.class_totals[intent] + self.alpha * vocabulary_size
+            score = math.log(count / total)
+            for token in tokens:
+                score += math.log((self.token_counts[intent][token] + self.alpha) / denominator)
+            scores[intent] = score
+
+        # Normalize log scores into posteriors
+        best = max(scores, key=scores.get)
+        peak = scores[best]
+        norm = sum(math.exp(score - peak) for score in scores.values())
+        return best, 1.0 / norm
+
+    def to_dict(self) -> dict:
+        return {
+            "alpha": self.alpha,
+            "min_known_fraction": self.min_known_fraction,
+            "class_counts": dict(self.class_counts),
+            "token_counts": {intent: dict(counts) for intent, counts in self.token_counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NaiveBayesIntentModel":
+        model = cls(alpha=data.get("alpha", 1.0), min_known_fraction=data.get("min_known_fraction", 0.5))
+        model.class_counts = Counter(data["class_counts"])
+        for intent, counts in data["token_counts"].items():
+            model.token_counts[intent] = Counter(counts)
+            model.class_totals[intent] = sum(counts.values())
+            model.vocabulary.update(counts)
+        return model
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesIntentModel":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class IntentClassifier:
+    """Runs the stages in order and returns the first prediction at or above threshold."""
+
+    def __init__(self, stages: list, threshold: float = 0.9):
+        self.stages = stages
+        self.threshold = threshold
+
+    def classify(self, message: str, focused_card: Optional[dict] = None) -> Optional[dict]:
+        has_focused_card = bool(focused_card)
+        for stage in self.stages:
+            prediction = stage.predict(message, has_focused_card)
+            if prediction is None:
+                continue
+            intent, confidence = prediction
+            if confidence >= self.threshold:
+                return {
+                    "intent": intent,
+                    "confidence": round(confidence, 3),
+                    "reasoning": f"Classified locally ({stage.name})",
+                    "source": stage.name
+                }
+        return None
+
+
+class IntentLog:
+    """Appends LLM-labeled intents to a JSONL file: the training and evaluation set."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, message: str, focused_card: Optional[dict], intent: str, confidence, latency_ms: float) -> None:
+        entry = {
+            "message": message,
+            "has_focused_card": bool(focused_card),
+            "intent": intent,
+            "confidence": confidence,
+            "latency_ms": round(latency_ms, 1),
+            "timestamp": datetime.now().isoformat()
+        }
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Error writing intent log: {e}")
+
+
+def read_intent_log(path: str) -> list:
+    """Load (message, has_focused_card, intent, latency_ms) rows from an IntentLog file"""
+    rows = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            rows.append((entry["message"], entry.get("has_focused_card", False), entry["intent"], entry.get("latency_ms")))
+    return rows
+
+
+def create_intent_classifier() -> Optional[IntentClassifier]:
+    """Build the classifier from INTENT_CLASSIFIER, INTENT_MODEL_PATH and INTENT_FAST_PATH_THRESHOLD"""
+    stage_names = [name.strip() for name in os.getenv("INTENT_CLASSIFIER", "rules,model").split(",") if name.strip()]
+    stages = []
+    for name in stage_names:
+        if name == "rules":
+            stages.append(KeywordRules())
+        elif name == "model":
+            model_path = os.getenv("INTENT_MODEL_PATH", "intent_model.json")
+            if os.path.exists(model_path):
+                stages.append(NaiveBayesIntentModel.load(model_path))
+                print(f"✓ Loaded intent model from {model_path}")
+
+    if not stages:
+        return None
+    return IntentClassifier(stages, threshold=float(os.getenv("INTENT_FAST_PATH_THRESHOLD", "0.9")))
+
+
+def create_intent_log() -> Optional[IntentLog]:
+    path = os.getenv("INTENT_LOG_PATH")
+    return IntentLog(path) if path else None
@@ -0,0 +1,274 @@
+"""Prometheus metrics for the LangGraph service, served at GET /metrics.
+
+Covers request latency per route, each workflow node, Bedrock calls by model,
+and Redis round trips, each with an in-flight gauge and an error counter. A
+slow chat turn can be broken down by node, then by the calls the node made.
+Calls to the backend service and answer cache lookups are also timed here,
+and their JSON stats endpoints are summaries of these metrics.
+"""
+from contextlib import contextmanager
+import functools
+import math
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from bedrock_limiter import error_code
+
+# Bedrock calls and whole requests run for seconds; keep resolution up to a minute
+SLOW_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route",
+    ["method", "route", "status"], buckets=SLOW_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled, by route", ["method", "route"])
+HTTP_ERRORS = Counter("http_request_errors_total", "Responses with a 5xx status, by route", ["method", "route", "status"])
+
+BEDROCK_DURATION = Histogram(
+    "bedrock_request_duration_seconds", "Bedrock call latency per attempt, by model",
+    ["model", "operation"], buckets=SLOW_BUCKETS
+)
+BEDROCK_IN_FLIGHT = Gauge("bedrock_requests_in_flight", "Bedrock calls awaiting a reply, by model", ["model"])
+BEDROCK_ERRORS = Counter("bedrock_errors_total", "Failed Bedrock attempts, by model and error code", ["model", "code"])
+
+
+def metrics_payload() -> tuple:
+    """(body, content type) for GET /metrics"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def _route(request) -> str:
+    # The URL rule, not the path, so /cards/<int:card_id> is one series
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _request_started(request, g) -> None:
+    g.metrics_route = _route(request)
+    g.metrics_started = time.perf_counter()
+    HTTP_IN_FLIGHT.labels(request.method, g.metrics_route).inc()
+
+
+def _request_finished(request, g, response):
+    started = getattr(g, "metrics_started", None)
+    if started is not None:
+        status = str(response.status_code)
+        HTTP_DURATION.labels(request.method, g.metrics_route, status).observe(time.perf_counter() - started)
+        if response.status_code >= 500:
+            HTTP_ERRORS.labels(request.method, g.metrics_route, status).inc()
+    return response
+
+
+def _request_torn_down(request, g) -> None:
+    if getattr(g, "metrics_started", None) is not None:
+        HTTP_IN_FLIGHT.labels(request.method, g.metrics_route).dec()
+
+
+def instrument_quart(app) -> None:
+    """Record latency, in-flight count and 5xx responses for every Quart route.
+
+    Streamed (SSE) responses are timed to their first byte, when the view returns.
+    """
+    from quart import g, request
+
+    @app.before_request
+    async def metrics_request_started():
+        _request_started(request, g)
+
+    @app.after_request
+    async def metrics_request_finished(response):
+        return _request_finished(request, g, response)
+
+    @app.teardown_request
+    async def metrics_request_torn_down(error):
+        _request_torn_down(request, g)
+
+
+@contextmanager
+def _bedrock_timer(model_id: str, operation: str):
+    BEDROCK_IN_FLIGHT.labels(model_id).inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        BEDROCK_ERRORS.labels(model_id, error_code(e) or type(e).__name__).inc()
+        raise
+    finally:
+        BEDROCK_DURATION.labels(model_id, operation).observe(time.perf_counter() - started)
+        BEDROCK_IN_FLIGHT.labels(model_id).dec()
+
+
+def observe_bedrock(model_id: str, operation: str, fn):
+    """Coroutine function fn, timed as one Bedrock attempt; wrap inside the limiter so each retry is observed"""
+    async def observed():
+        with _bedrock_timer(model_id, operation):
+            return await fn()
+    return observed
+
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+NODE_DURATION = Histogram(
+    "workflow_node_duration_seconds", "LangGraph node latency, by node", ["node"], buckets=SLOW_BUCKETS
+)
+NODE_IN_FLIGHT = Gauge("workflow_nodes_in_flight", "LangGraph nodes running, by node", ["node"])
+NODE_ERRORS = Counter("workflow_node_errors_total", "LangGraph nodes that raised, by node", ["node"])
+
+REDIS_DURATION = Histogram(
+    "redis_command_duration_seconds", "Redis round-trip latency, by command (PIPELINE/MULTI for batches)",
+    ["command"], buckets=FAST_BUCKETS
+)
+REDIS_IN_FLIGHT = Gauge("redis_commands_in_flight", "Redis round trips awaiting a reply")
+REDIS_ERRORS = Counter("redis_command_errors_total", "Failed Redis round trips, by command", ["command"])
+
+
+@contextmanager
+def _timer(duration, in_flight, errors):
+    """Observe the block on already-labelled metric children"""
+    in_flight.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errors.inc()
+        raise
+    finally:
+        duration.observe(time.perf_counter() - started)
+        in_flight.dec()
+
+
+def timed_node(name: str, node):
+    """Wrap a coroutine graph node to record its latency, in-flight count and errors"""
+    metrics = NODE_DURATION.labels(name), NODE_IN_FLIGHT.labels(name), NODE_ERRORS.labels(name)
+
+    @functools.wraps(node)
+    async def timed(state):
+        with _timer(*metrics):
+            return await node(state)
+    return timed
+
+
+def _redis_timer(command: str):
+    return _timer(REDIS_DURATION.labels(command), REDIS_IN_FLIGHT, REDIS_ERRORS.labels(command))
+
+
+def _redis_command(args) -> str:
+    return str(args[0]).split(" ", 1)[0].upper() if args else "UNKNOWN"
+
+
+def instrument_redis(client):
+    """Time each command and pipeline round trip of a redis.asyncio client, in place"""
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+
+    async def timed_command(*args, **options):
+        with _redis_timer(_redis_command(args)):
+            return await execute_command(*args, **options)
+
+    def timed_pipeline(transaction=True, shard_hint=None):
+        return _instrument_pipeline(pipeline(transaction=transaction, shard_hint=shard_hint), "MULTI" if transaction else "PIPELINE")
+
+    client.execute_command = timed_command
+    client.pipeline = timed_pipeline
+    return client
+
+
+def _instrument_pipeline(pipe, command: str):
+    execute = pipe.execute
+
+    async def timed_execute(*args, **kwargs):
+        with _redis_timer(command):
+            return await execute(*args, **kwargs)
+
+    pipe.execute = timed_execute
+    return pipe
+
+
+BACKEND_DURATION = Histogram(
+    "backend_request_duration_seconds", "Calls to the backend service, retries included, by route",
+    ["route"], buckets=SLOW_BUCKETS
+)
+BACKEND_ERRORS = Counter("backend_request_errors_total", "Backend calls that failed or returned a 5xx, by route", ["route"])
+BACKEND_RETRIES = Counter("backend_request_retries_total", "Retried backend attempts, by route", ["route"])
+
+ANSWER_CACHE_DURATION = Histogram(
+    "answer_cache_duration_seconds", "Answer cache lookups by outcome (hit/miss), and the generations misses cost (generate)",
+    ["outcome"], buckets=SLOW_BUCKETS
+)
+
+
+def observe_backend_call(route: str, seconds: float, ok: bool, retries: int) -> None:
+    BACKEND_DURATION.labels(route).observe(seconds)
+    if not ok:
+        BACKEND_ERRORS.labels(route).inc()
+    if retries:
+        BACKEND_RETRIES.labels(route).inc(retries)
+
+
+def backend_call_stats() -> dict:
+    """Per-route calls, errors, retries and latency since the process started, from the backend metrics"""
+    errors = _counter_values(BACKEND_ERRORS)
+    retries = _counter_values(BACKEND_RETRIES)
+    return {
+        route: {
+            "calls": latency.pop("count"),
+            "errors": int(errors.get(route, 0)),
+            "retries": int(retries.get(route, 0)),
+            **latency
+        }
+        for route, latency in histogram_stats(BACKEND_DURATION).items()
+    }
+
+
+def histogram_stats(histogram) -> dict:
+    """{label value: count, mean and p50/p95 in ms} for a histogram with one label.
+
+    Percentiles are interpolated within buckets, as PromQL's histogram_quantile does.
+    """
+    series = {}
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            (label,) = [value for name, value in sample.labels.items() if name != "le"]
+            entry = series.setdefault(label, {"buckets": [], "count": 0, "sum": 0.0})
+            if sample.name.endswith("_bucket"):
+                entry["buckets"].append((float(sample.labels["le"]), sample.value))
+            elif sample.name.endswith("_count"):
+                entry["count"] = int(sample.value)
+            elif sample.name.endswith("_sum"):
+                entry["sum"] = sample.value
+    return {label: _summary(entry) for label, entry in series.items()}
+
+
+def _summary(entry: dict) -> dict:
+    buckets = sorted(entry["buckets"])
+    count = entry["count"]
+    return {
+        "count": count,
+        "mean_ms": round(entry["sum"] / count * 1000, 1) if count else 0.0,
+        "p50_ms": round(_quantile(buckets, 0.5) * 1000, 1),
+        "p95_ms": round(_quantile(buckets, 0.95) * 1000, 1)
+    }
+
+
+def _quantile(buckets: list, q: float) -> float:
+    """Estimate from cumulative (upper bound, count) buckets; the +Inf bucket reports the highest finite bound"""
+    if not buckets or not buckets[-1][1]:
+        return 0.0
+    rank = q * buckets[-1][1]
+    lower, below = 0.0, 0.0
+    for upper, cumulative in buckets:
+        if cumulative >= rank:
+            if math.isinf(upper):
+                return lower
+            return lower + (upper - lower) * (rank - below) / (cumulative - below)
+        lower, below = upper, cumulative
+    return lower
+
+
+def _counter_values(counter) -> dict:
+    """{label value: total} for a counter with one label"""
+    return {
+        next(iter(sample.labels.values())): sample.value
+        for metric in counter.collect()
+        for sample in metric.samples if sample.name.endswith("_total")
+    }
@@ -1,18 +1,42 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from app import ConversationalWorkflow
+"""LangGraph backend: a Quart (ASGI) app served by hypercorn.
+
+Workflow nodes run under graph.ainvoke with non-blocking Bedrock, Redis and
+backend clients, so concurrent chats are bounded by upstream quotas rather
+than threads. Run with:
+
+    hypercorn server:app --bind 0.0.0.0:8000
+"""
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+from app import ConversationalWorkflow, chat_response_data
+from database import validate_history_cursor
+from llm_cache import llm_cache_stats
+from single_flight import single_flight_stats
+from metrics import instrument_quart, metrics_payload
+from tracing import configure_tracing, trace_quart, traced_stream
+from answer_cache import answer_cache_stats
 import json
-import uuid
 from datetime import datetime
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for React frontend
+configure_tracing("temporal-langgraph")
+
+app = cors(Quart(__name__))
+instrument_quart(app)
+trace_quart(app)
 
-# Initialize the LangGraph workflow
+# Initialize the LangGraph workflow; connections are opened in startup()
 workflow = ConversationalWorkflow()
 
+@app.before_serving
+async def startup():
+    await workflow.init()
+
+@app.after_serving
+async def shutdown():
+    await workflow.close()
+
 @app.route('/health', methods=['GET'])
-def health_check():
+async def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy",
@@ -22,10 +46,10 @@ def health_check():
     })
 
 @app.route('/chat', methods=['POST'])
-def chat():
+async def chat():
     """Main chat endpoint for processing user messages"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         
         if not data or 'message' not in data:
             return jsonify({
@@ -37,33 +61,13 @@ def chat():
         session_id = data.get('session_id')  # Optional session ID for continuity
         focused_card = data.get('focused_card')  # Optional focused card context
         
-        # If a focused card is provided and we have Redis, set it in the session before processing
-        if focused_card and workflow.use_redis:
-            if session_id:
-                # Set focused card for existing session
-                workflow.set_focused_card(session_id, focused_card)
-                print(f"🎯 Set focused card for session {session_id[:8]}...: {focused_card.get('title', 'Untitled')}")
-            else:
-                # For new sessions, we'll handle this in the process_message method
-                print(f"🎯 Focused card provided for new session: {focused_card.get('title', 'Untitled')}")
-        
-        # Process the message through LangGraph workflow, passing the focused card
-        result = workflow.process_message(user_message, session_id, focused_card)
+        # Process the message through LangGraph workflow, passing the focused card;
+        # the workflow saves it to the session along with the rest of the turn
+        result = await workflow.process_message(user_message, session_id, focused_card)
         
         return jsonify({
             "success": True,
-            "data": {
-                "message": result["user_message"],
-                "response": result["response"],
-                "intent": result["intent"],
-                "confidence": result["confidence"],
-                "reasoning": result["reasoning"],
-                "session_id": result["session_id"],
-                "card_id": result.get("card_id"),
-                "updated_card": result.get("updated_card"),
-                "focused_card": result.get("focused_card"),
-                "timestamp": datetime.now().isoformat()
-            }
+            "data": chat_response_data(result)
         })
         
     except Exception as e:
@@ -72,11 +76,50 @@ def chat():
             "error": str(e)
         }), 500
 
+@app.route('/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Streaming chat endpoint: workflow progress and response tokens as Server-Sent Events"""
+    data = await request.get_json()
+    
+    if not data or 'message' not in data:
+        return jsonify({
+            "success": False,
+            "error": "Missing 'message' field"
+        }), 400
+    
+    user_message = data['message']
+    session_id = data.get('session_id')
+    focused_card = data.get('focused_card')
+    
+    async def generate():
+        try:
+            async for event, payload in workflow.stream_message(user_message, session_id, focused_card):
+                if event == "done":
+                    payload = chat_response_data(payload)
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'success': False, 'error': str(e)})}\n\n".encode("utf-8")
+    
+    response = Response(
+        traced_stream(generate()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Stop nginx from buffering the stream
+        }
+    )
+    response.timeout = None  # Generation can outlast Quart's default response timeout
+    return response
+
 @app.route('/sessions/<session_id>/history', methods=['GET'])
-def get_session_history(session_id):
-    """Get conversation history for a session"""
+async def get_session_history(session_id):
+    """Get conversation history for a session, newest page first.
+    
+    Pass the returned next_cursor as ?cursor= to page back through older messages.
+    """
     try:
-        limit = request.args.get('limit', 10, type=int)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        cursor = request.args.get('cursor')
         
         if not workflow.use_redis:
             return jsonify({
@@ -84,14 +127,24 @@ def get_session_history(session_id):
                 "error": "Session history requires Redis to be enabled"
             }), 400
         
-        history = workflow.get_session_history(session_id, limit)
+        try:
+            validate_history_cursor(cursor)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        history, next_cursor = await workflow.get_session_history_page(session_id, limit, cursor)
         
         return jsonify({
             "success": True,
             "data": {
                 "session_id": session_id,
                 "history": history,
-                "count": len(history)
+                "count": len(history),
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
             }
         })
         
@@ -102,10 +155,10 @@ def get_session_history(session_id):
         }), 500
 
 @app.route('/sessions/<session_id>/focused-card', methods=['POST'])
-def set_focused_card(session_id):
+async def set_focused_card(session_id):
     """Set a focused card for the session"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         
         if not data or 'card' not in data:
             return jsonify({
@@ -124,7 +177,7 @@ def set_focused_card(session_id):
                     "error": f"Missing required field '{field}' in card data"
                 }), 400
         
-        success = workflow.set_focused_card(session_id, card_data)
+        success = await workflow.set_focused_card(session_id, card_data)
         
         if success:
             return jsonify({
@@ -144,10 +197,10 @@ def set_focused_card(session_id):
         }), 500
 
 @app.route('/sessions/<session_id>/focused-card', methods=['DELETE'])
-def clear_focused_card(session_id):
+async def clear_focused_card(session_id):
     """Clear the focused card for a session"""
     try:
-        success = workflow.clear_focused_card(session_id)
+        success = await workflow.clear_focused_card(session_id)
         
         if success:
             return jsonify({
@@ -167,8 +220,11 @@ def clear_focused_card(session_id):
         }), 500
 
 @app.route('/sessions/active', methods=['GET'])
-def get_active_sessions():
-    """Get list of active sessions"""
+async def get_active_sessions():
+    """List active sessions, most recently active first.
+    
+    Paginated with ?limit= (default 50, max 500) and the returned next_cursor as ?cursor=.
+    """
     try:
         if not workflow.use_redis or not workflow.state_manager:
             return jsonify({
@@ -176,20 +232,23 @@ def get_active_sessions():
                 "error": "Session management requires Redis to be enabled"
             }), 400
         
-        active_sessions = workflow.state_manager.get_active_sessions()
-        
-        # Get session info for each active session
-        session_details = []
-        for session_id in active_sessions:
-            session_info = workflow.state_manager.get_session_info(session_id)
-            if session_info:
-                session_details.append(session_info)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        try:
+            page = await workflow.state_manager.get_active_sessions_page(limit, request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         return jsonify({
             "success": True,
             "data": {
-                "active_sessions": session_details,
-                "count": len(session_details)
+                "active_sessions": page["sessions"],
+                "count": len(page["sessions"]),
+                "total": page["total"],
+                "next_cursor": page["next_cursor"],
+                "has_more": page["next_cursor"] is not None
             }
         })
         
@@ -200,7 +259,7 @@ def get_active_sessions():
         }), 500
 
 @app.route('/workflow/intents', methods=['GET'])
-def get_supported_intents():
+async def get_supported_intents():
     """Get list of supported workflow intents"""
     return jsonify({
         "success": True,
@@ -222,8 +281,49 @@ def get_supported_intents():
         }
     })
 
+@app.route('/backend/stats', methods=['GET'])
+async def get_backend_stats():
+    """Per-route latency, error and retry counts for calls to the backend service"""
+    return jsonify({
+        "success": True,
+        "stats": workflow.backend.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Prometheus metrics for this process"""
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
+
+@app.route('/bedrock/stats', methods=['GET'])
+async def get_bedrock_stats():
+    """Coalesced Bedrock calls, and per-model concurrency limits, throttles and retries"""
+    return jsonify({
+        "success": True,
+        "stats": {
+            "single_flight": single_flight_stats(workflow.ai_service.single_flight),
+            "limiter": workflow.ai_service.limiter.stats()
+        }
+    })
+
+@app.route('/llm-cache/stats', methods=['GET'])
+async def get_llm_cache_stats():
+    """Hit rates per cached call site; {"enabled": false} unless LLM_CACHE=true"""
+    return jsonify({
+        "success": True,
+        "stats": llm_cache_stats(workflow.ai_service.response_cache)
+    })
+
+@app.route('/answer-cache/stats', methods=['GET'])
+async def get_answer_cache_stats():
+    """Semantic answer cache hit rate and hit/miss/generation latency"""
+    return jsonify({
+        "success": True,
+        "stats": answer_cache_stats(workflow.answer_cache)
+    })
+
 @app.route('/workflow/status', methods=['GET'])
-def get_workflow_status():
+async def get_workflow_status():
     """Get workflow system status"""
     return jsonify({
         "success": True,
@@ -245,14 +345,14 @@ def get_workflow_status():
     })
 
 @app.errorhandler(404)
-def not_found(error):
+async def not_found(error):
     return jsonify({
         "success": False,
         "error": "Endpoint not found"
     }), 404
 
 @app.errorhandler(500)
-def internal_error(error):
+async def internal_error(error):
     return jsonify({
         "success": False,
         "error": "Internal server error"
@@ -267,6 +367,7 @@ if __name__ == '__main__':
     print("\n📋 Available Endpoints:")
     print("  GET  /health                           - Health check")
     print("  POST /chat                            - Process chat messages")
+    print("  POST /chat/stream                     - Stream chat progress and tokens (SSE)")
     print("  GET  /sessions/<id>/history           - Get conversation history")
     print("  POST /sessions/<id>/focused-card      - Set focused card")
     print("  DEL  /sessions/<id>/focused-card      - Clear focused card")
@@ -275,4 +376,4 @@ if __name__ == '__main__':
     print("  GET  /workflow/status                - Get workflow status")
     print("\n" + "="*60)
     
-    app.run(host='0.0.0.0', port=8000, debug=True)
+    app.run(host='0.0.0.0', port=8000)
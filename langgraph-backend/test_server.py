@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Quick test script for the LangGraph Flask server
+Quick test script for the LangGraph server
 """
 
 import requests
@@ -66,6 +66,36 @@ def test_chat_endpoint():
         except Exception as e:
             print(f"❌ Request failed: {e}")
 
+def test_chat_stream_endpoint():
+    """Test the streaming chat endpoint"""
+    print("\n🔍 Testing streaming chat endpoint...")
+    try:
+        response = requests.post(
+            f"{SERVER_URL}/chat/stream",
+            json={"message": "What is machine learning?"},
+            stream=True
+        )
+        print(f"Status: {response.status_code}")
+        
+        events = []
+        tokens = []
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                events.append(event)
+            elif line.startswith("data: ") and event == "token":
+                tokens.append(json.loads(line[len("data: "):])["text"])
+        
+        print(f"📡 Events: {' → '.join(dict.fromkeys(events))}")
+        print(f"📝 Streamed {len(tokens)} tokens: {''.join(tokens)[:100]}...")
+        if events and events[-1] == "done":
+            print("✅ Stream completed with 'done' event")
+        else:
+            print("❌ Stream did not finish with 'done'")
+    except Exception as e:
+        print(f"❌ Stream request failed: {e}")
+
 def test_workflow_status():
     """Test the workflow status endpoint"""
     print("\n🔍 Testing workflow status...")
@@ -80,7 +110,7 @@ def test_workflow_status():
         print(f"❌ Status request failed: {e}")
 
 def main():
-    print("🚀 LangGraph Flask Server Test Suite")
+    print("🚀 LangGraph Server Test Suite")
     print("="*50)
     
     # Test basic connectivity first
@@ -90,6 +120,7 @@ def main():
     
     # Test main functionality
     test_chat_endpoint()
+    test_chat_stream_endpoint()
     test_workflow_status()
     
     print("\n" + "="*50)
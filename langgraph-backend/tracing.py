@@ -0,0 +1,242 @@
+"""OpenTelemetry tracing for the LangGraph service.
+
+Each chat request gets a server span, and each workflow node gets a child
+span. Below the nodes are spans for Bedrock calls, one child per attempt, and
+for calls to the backend service. Those carry a traceparent header, so the
+backend's request, SQL and Bedrock spans join the same trace, and one slow
+chat turn can be followed across both services. Tracing is off unless
+TRACING_EXPORTER is set; see configure_tracing().
+"""
+from contextlib import contextmanager
+import functools
+import os
+
+from opentelemetry import propagate, trace
+from opentelemetry.context import attach, detach, get_current
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from bedrock_limiter import error_code
+
+tracer = trace.get_tracer("temporal.langgraph")
+
+
+def configure_tracing(default_service_name: str) -> None:
+    """Install an exporting tracer provider when TRACING_EXPORTER is otlp, file or console.
+
+    otlp sends to OTEL_EXPORTER_OTLP_ENDPOINT (http/protobuf, default
+    http://localhost:4318); file appends one JSON span per line to TRACING_FILE.
+    """
+    name = os.getenv("TRACING_EXPORTER", "none").lower()
+    if name == "none":
+        return
+    exporter = _exporter(name)
+    if exporter is None:
+        print(f"⚠ Unknown TRACING_EXPORTER '{name}'; tracing disabled")
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", default_service_name)}),
+        # Follow the caller's sampling decision so a trace is never cut in half between services
+        sampler=ParentBased(TraceIdRatioBased(float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))))
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    print(f"✓ Tracing enabled, exporting to {name}")
+
+
+def _exporter(name: str):
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    if name in ("file", "console"):
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        if name == "console":
+            return ConsoleSpanExporter()
+        out = open(os.getenv("TRACING_FILE", "traces.jsonl"), "a", encoding="utf-8", buffering=1)
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + os.linesep)
+    return None
+
+
+def _route(request) -> str:
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _request_started(request, g) -> None:
+    route = _route(request)
+    attributes = {"http.request.method": request.method, "http.route": route, "url.path": request.path}
+    request_id = request.headers.get("X-Request-ID")
+    if request_id:
+        attributes["http.request.header.x-request-id"] = (request_id,)
+    span = tracer.start_span(
+        f"{request.method} {route}", context=propagate.extract(request.headers),
+        kind=SpanKind.SERVER, attributes=attributes
+    )
+    g.trace_span = span
+    g.trace_token = attach(trace.set_span_in_context(span))
+
+
+def _request_finished(g, response):
+    span = g.get("trace_span")
+    if span is not None:
+        span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+        span_context = span.get_span_context()
+        if span_context.is_valid:
+            # Lets nginx's access log and the frontend name the trace of a slow request
+            response.headers["X-Trace-Id"] = trace.format_trace_id(span_context.trace_id)
+    return response
+
+
+def _request_torn_down(g, error) -> None:
+    span = g.pop("trace_span", None)
+    if span is None:
+        return
+    if error is not None:
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))
+    if not g.pop("trace_streaming", False):
+        span.end()
+    detach(g.pop("trace_token"))
+
+
+def trace_quart(app) -> None:
+    """Wrap every Quart request in a server span; wrap streamed bodies in traced_stream()"""
+    from quart import g, request
+
+    @app.before_request
+    async def trace_request_started():
+        _request_started(request, g)
+
+    @app.after_request
+    async def trace_request_finished(response):
+        return _request_finished(g, response)
+
+    @app.teardown_request
+    async def trace_request_torn_down(error):
+        _request_torn_down(g, error)
+
+
+def traced_stream(events):
+    """Run a streamed response body (an async generator) inside the request span, ending the span with the stream.
+
+    Quart tears the request down before a streamed body is sent, which would
+    end the span at the first byte and start the stream's work in new traces.
+    """
+    from quart import g
+
+    span = g.get("trace_span")
+    if span is not None:
+        g.trace_streaming = True
+    return _traced_stream(events, get_current(), span)
+
+
+async def _traced_stream(events, request_context, span):
+    try:
+        while True:
+            token = attach(request_context)
+            try:
+                item = await events.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                detach(token)
+            yield item
+    finally:
+        await events.aclose()
+        if span is not None:
+            span.end()
+
+
+def _bedrock_attributes(model_id: str, operation: str) -> dict:
+    return {"gen_ai.system": "aws.bedrock", "gen_ai.operation.name": operation, "gen_ai.request.model": model_id}
+
+
+@contextmanager
+def bedrock_span(model_id: str, operation: str):
+    """Current span for a whole Bedrock call: coalescing, limiter waits and every attempt"""
+    with tracer.start_as_current_span(f"bedrock {operation}", kind=SpanKind.CLIENT,
+                                      attributes=_bedrock_attributes(model_id, operation)) as span:
+        yield span
+
+
+@contextmanager
+def bedrock_stream_span(model_id: str, operation: str):
+    """bedrock_span that is not made current, so a generator can hold it open across yields.
+
+    Use activate() around the calls that should be its children.
+    """
+    span = tracer.start_span(f"bedrock {operation}", kind=SpanKind.CLIENT, attributes=_bedrock_attributes(model_id, operation))
+    try:
+        yield span
+    except Exception as e:
+        span.record_exception(e)
+        span.set_status(Status(StatusCode.ERROR, str(e)))
+        raise
+    finally:
+        span.end()
+
+
+def activate(span):
+    """Make span current for a block without ending it afterwards"""
+    return trace.use_span(span, end_on_exit=False, record_exception=False, set_status_on_exception=False)
+
+
+@contextmanager
+def _attempt_span(model_id: str, operation: str):
+    with tracer.start_as_current_span(f"bedrock {operation} attempt", kind=SpanKind.CLIENT,
+                                      attributes=_bedrock_attributes(model_id, operation)) as span:
+        try:
+            yield
+        except Exception as e:
+            span.set_attribute("error.type", error_code(e) or type(e).__name__)
+            raise
+
+
+def trace_bedrock_attempt(model_id: str, operation: str, fn):
+    """Coroutine function fn, in a span of its own; wrap inside the limiter so each retry gets a span"""
+    async def traced():
+        with _attempt_span(model_id, operation):
+            return await fn()
+    return traced
+
+
+def traced_node(name: str, node):
+    """Wrap a coroutine graph node in a span named after it"""
+    @functools.wraps(node)
+    async def traced(state):
+        with tracer.start_as_current_span(f"node {name}", attributes={"workflow.node": name}):
+            return await node(state)
+    return traced
+
+
+@contextmanager
+def backend_span(method: str, path: str, route: str):
+    """Current client span for one call to the backend, retries included; route is e.g. "PUT /cards/{id}" """
+    with tracer.start_as_current_span(f"backend {route}", kind=SpanKind.CLIENT, attributes={
+        "http.request.method": method,
+        "url.path": path,
+        "peer.service": "temporal-backend"
+    }) as span:
+        yield span
+
+
+def record_backend_response(status_code: int, retries: int) -> None:
+    span = trace.get_current_span()
+    span.set_attribute("http.response.status_code", status_code)
+    if retries:
+        span.set_attribute("http.request.resend_count", retries)
+    if status_code >= 500:
+        span.set_status(Status(StatusCode.ERROR))
+
+
+def trace_headers() -> dict:
+    """traceparent (and tracestate) headers for the current span, for an outgoing request"""
+    headers = {}
+    propagate.inject(headers)
+    return headers
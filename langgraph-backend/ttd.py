@@ -1,16 +1,18 @@
 from app import ConversationalWorkflow
 from ai_service import AIService
-from database import RedisManager, ConversationStateManager, create_database_manager
+from database import RedisManager, create_database_manager
+import asyncio
 import requests
 import json
 import uuid
 
-def test_redis_connection():
+async def test_redis_connection():
     """Test Redis connection and basic operations"""
     print("=== Testing Redis Connection ===")
     
     try:
         redis_manager = RedisManager()
+        await redis_manager.connect()
         print("✓ Redis connection successful")
         
         # Test basic operations
@@ -18,14 +20,14 @@ def test_redis_connection():
         test_value = {"message": "hello", "timestamp": "2025-09-17"}
         
         # Set JSON data
-        if redis_manager.set_json(test_key, test_value, ttl=60):
+        if await redis_manager.set_json(test_key, test_value, ttl=60):
             print("✓ JSON data stored successfully")
         else:
             print("✗ Failed to store JSON data")
             return False
         
         # Get JSON data
-        retrieved_value = redis_manager.get_json(test_key)
+        retrieved_value = await redis_manager.get_json(test_key)
         if retrieved_value == test_value:
             print("✓ JSON data retrieved successfully")
         else:
@@ -33,13 +35,13 @@ def test_redis_connection():
             return False
         
         # Test key existence
-        if redis_manager.exists(test_key):
+        if await redis_manager.exists(test_key):
             print("✓ Key existence check working")
         else:
             print("✗ Key existence check failed")
         
         # Cleanup
-        if redis_manager.delete(test_key):
+        if await redis_manager.delete(test_key):
             print("✓ Key deletion successful")
         else:
             print("✗ Key deletion failed")
@@ -50,12 +52,14 @@ def test_redis_connection():
         print(f"✗ LangGraph workflow test failed: {e}")
         return False
 
-def test_session_continuity():
+async def test_session_continuity():
     """Test session continuity and focused card functionality"""
     print("=== Testing Session Continuity ===")
     
     workflow = ConversationalWorkflow()
     
+    await workflow.init()
+    
     if not workflow.use_redis:
         print("⚠ Skipping session continuity test - Redis not available")
         return False
@@ -63,7 +67,7 @@ def test_session_continuity():
     try:
         # Start a conversation
         print("Starting new conversation...")
-        result1 = workflow.process_message("What is Python programming?")
+        result1 = await workflow.process_message("What is Python programming?")
         session_id = result1.get("session_id")
         
         if not session_id:
@@ -75,7 +79,7 @@ def test_session_continuity():
         
         # Continue conversation in same session
         print("Continuing conversation...")
-        result2 = workflow.process_message(
+        result2 = await workflow.process_message(
             "Now tell me about Django web framework", 
             session_id=session_id
         )
@@ -91,14 +95,14 @@ def test_session_continuity():
             "content": "Python is excellent for web development with frameworks like Django and Flask."
         }
         
-        if workflow.set_focused_card(session_id, card_data):
+        if await workflow.set_focused_card(session_id, card_data):
             print("✓ Focused card set")
         else:
             print("✗ Failed to set focused card")
             return False
         
         # Test conversation with focused card context
-        result3 = workflow.process_message(
+        result3 = await workflow.process_message(
             "Update this with Flask information",
             session_id=session_id
         )
@@ -108,14 +112,14 @@ def test_session_continuity():
         print(f"  Response: {result3['response'][:80]}...")
         
         # Check conversation history
-        history = workflow.get_session_history(session_id, limit=5)
+        history = await workflow.get_session_history(session_id, limit=5)
         print(f"✓ Retrieved conversation history: {len(history)} messages")
         
         for i, msg in enumerate(history, 1):
             print(f"  {i}. {msg['user_message'][:40]}... -> {msg['intent']}")
         
         # Test clearing focused card
-        if workflow.clear_focused_card(session_id):
+        if await workflow.clear_focused_card(session_id):
             print("✓ Focused card cleared")
         else:
             print("⚠ Failed to clear focused card")
@@ -126,16 +130,16 @@ def test_session_continuity():
         print(f"✗ Session continuity test failed: {e}")
         return False
 
-def test_conversation_state_manager():
+async def test_conversation_state_manager():
     """Test conversation state management"""
     print("\n=== Testing Conversation State Manager ===")
     
     try:
-        state_manager = create_database_manager()
+        state_manager = await create_database_manager()
         print("✓ ConversationStateManager initialized")
         
         # Create a test session
-        session_id = state_manager.create_new_session(user_id="test_user")
+        session_id = await state_manager.create_new_session(user_id="test_user")
         print(f"✓ Created session: {session_id}")
         
         # Test conversation state
@@ -146,14 +150,14 @@ def test_conversation_state_manager():
             "current_card_id": 123
         }
         
-        if state_manager.save_conversation_state(session_id, test_state):
+        if await state_manager.save_conversation_state(session_id, test_state):
             print("✓ Conversation state saved")
         else:
             print("✗ Failed to save conversation state")
             return False
         
         # Load conversation state
-        loaded_state = state_manager.load_conversation_state(session_id)
+        loaded_state = await state_manager.load_conversation_state(session_id)
         if loaded_state and loaded_state["intent"] == "UPDATE":
             print("✓ Conversation state loaded successfully")
         else:
@@ -167,12 +171,12 @@ def test_conversation_state_manager():
             "content": "Python is a programming language..."
         }
         
-        if state_manager.save_focused_card(session_id, focused_card):
+        if await state_manager.save_focused_card(session_id, focused_card):
             print("✓ Focused card saved")
         else:
             print("✗ Failed to save focused card")
         
-        loaded_card = state_manager.load_focused_card(session_id)
+        loaded_card = await state_manager.load_focused_card(session_id)
         if loaded_card and loaded_card["id"] == 123:
             print("✓ Focused card loaded successfully")
         else:
@@ -186,25 +190,33 @@ def test_conversation_state_manager():
         ]
         
         for msg in messages:
-            state_manager.add_message_to_history(session_id, msg)
+            await state_manager.add_message_to_history(session_id, msg)
         
-        history = state_manager.get_conversation_history(session_id, limit=5)
+        history = await state_manager.get_conversation_history(session_id, limit=5)
         if len(history) == 3:
             print("✓ Conversation history working")
             print(f"  History contains {len(history)} messages")
         else:
             print(f"✗ History count mismatch: expected 3, got {len(history)}")
         
+        # Page back through history two messages at a time
+        page, cursor = await state_manager.get_conversation_history_page(session_id, limit=2)
+        older, _ = await state_manager.get_conversation_history_page(session_id, limit=2, cursor=cursor)
+        if [m["user_message"] for m in older + page] == [m["user_message"] for m in messages]:
+            print("✓ History cursor paging working")
+        else:
+            print("✗ History paging returned messages out of order")
+        
         # Test session info
-        session_info = state_manager.get_session_info(session_id)
+        session_info = await state_manager.get_session_info(session_id)
         if session_info and session_info["session_id"] == session_id:
             print("✓ Session info retrieval working")
         else:
             print("✗ Failed to retrieve session info")
         
         # Cleanup test data
-        state_manager.clear_conversation_history(session_id)
-        state_manager.clear_focused_card(session_id)
+        await state_manager.clear_conversation_history(session_id)
+        await state_manager.clear_focused_card(session_id)
         print("✓ Test data cleaned up")
         
         return True
@@ -213,28 +225,28 @@ def test_conversation_state_manager():
         print(f"✗ Conversation state manager test failed: {e}")
         return False
 
-def test_session_management():
+async def test_session_management():
     """Test session creation and management"""
     print("\n=== Testing Session Management ===")
     
     try:
-        state_manager = create_database_manager()
+        state_manager = await create_database_manager()
         
         # Create multiple test sessions
         sessions = []
         for i in range(3):
-            session_id = state_manager.create_new_session(user_id=f"user_{i}")
+            session_id = await state_manager.create_new_session(user_id=f"user_{i}")
             sessions.append(session_id)
             print(f"✓ Created session {i+1}: {session_id[:8]}...")
         
         # Test session activity updates
         for session_id in sessions:
-            state_manager.update_session_activity(session_id)
+            await state_manager.update_session_activity(session_id)
         
         print("✓ Session activities updated")
         
         # Get active sessions
-        active_sessions = state_manager.get_active_sessions()
+        active_sessions = await state_manager.get_active_sessions()
         if len(active_sessions) >= len(sessions):
             print(f"✓ Found {len(active_sessions)} active sessions")
         else:
@@ -243,7 +255,7 @@ def test_session_management():
         # Test session info for each
         valid_sessions = 0
         for session_id in sessions:
-            session_info = state_manager.get_session_info(session_id)
+            session_info = await state_manager.get_session_info(session_id)
             if session_info:
                 valid_sessions += 1
         
@@ -258,33 +270,34 @@ def test_session_management():
         print(f"✗ Session management test failed: {e}")
         return False
 
-def test_redis_ttl_behavior():
+async def test_redis_ttl_behavior():
     """Test TTL (Time To Live) behavior"""
     print("\n=== Testing Redis TTL Behavior ===")
     
     try:
         redis_manager = RedisManager()
+        await redis_manager.connect()
         
         # Test short TTL
         test_key = "test:ttl"
         test_data = {"message": "this will expire"}
         
         # Set with 5 second TTL
-        if redis_manager.set_json(test_key, test_data, ttl=5):
+        if await redis_manager.set_json(test_key, test_data, ttl=5):
             print("✓ Data stored with 5-second TTL")
         else:
             print("✗ Failed to store data with TTL")
             return False
         
         # Check immediately
-        if redis_manager.exists(test_key):
+        if await redis_manager.exists(test_key):
             print("✓ Key exists immediately after creation")
         else:
             print("✗ Key should exist immediately")
         
         # Get TTL info (Redis command)
         try:
-            ttl = redis_manager.client.ttl(test_key)
+            ttl = await redis_manager.client.ttl(test_key)
             if ttl > 0:
                 print(f"✓ TTL set correctly: {ttl} seconds remaining")
             else:
@@ -299,29 +312,30 @@ def test_redis_ttl_behavior():
         print(f"✗ TTL test failed: {e}")
         return False
 
-def test_redis_error_handling():
+async def test_redis_error_handling():
     """Test Redis error handling scenarios"""
     print("\n=== Testing Redis Error Handling ===")
     
     try:
         redis_manager = RedisManager()
+        await redis_manager.connect()
         
         # Test getting non-existent key
-        non_existent = redis_manager.get_json("non:existent:key", "default_value")
+        non_existent = await redis_manager.get_json("non:existent:key", "default_value")
         if non_existent == "default_value":
             print("✓ Default value returned for non-existent key")
         else:
             print(f"✗ Expected default value, got: {non_existent}")
         
         # Test deleting non-existent key
-        delete_result = redis_manager.delete("non:existent:key")
+        delete_result = await redis_manager.delete("non:existent:key")
         if delete_result is False:
             print("✓ Delete operation handled non-existent key correctly")
         else:
             print(f"⚠ Unexpected delete result: {delete_result}")
         
         # Test exists on non-existent key
-        exists_result = redis_manager.exists("non:existent:key")
+        exists_result = await redis_manager.exists("non:existent:key")
         if exists_result is False:
             print("✓ Exists check correctly returned False")
         else:
@@ -333,7 +347,7 @@ def test_redis_error_handling():
         print(f"✗ Error handling test failed: {e}")
         return False
 
-def test_integration_with_workflow():
+async def test_integration_with_workflow():
     """Test integration between Redis state management and LangGraph workflow"""
     print("\n=== Testing Redis-Workflow Integration ===")
     
@@ -342,11 +356,12 @@ def test_integration_with_workflow():
         return False
     
     try:
-        state_manager = create_database_manager()
+        state_manager = await create_database_manager()
         workflow = ConversationalWorkflow()
+        await workflow.init()
         
         # Create a session for this test
-        session_id = state_manager.create_new_session(user_id="workflow_test")
+        session_id = await state_manager.create_new_session(user_id="workflow_test")
         print(f"✓ Created test session: {session_id[:8]}...")
         
         # Simulate a conversation flow
@@ -359,7 +374,7 @@ def test_integration_with_workflow():
             print(f"\nMessage {i}: '{message}'")
             
             # Process through workflow
-            result = workflow.process_message(message)
+            result = await workflow.process_message(message)
             
             # Store in Redis
             conversation_entry = {
@@ -369,27 +384,27 @@ def test_integration_with_workflow():
                 "response": result["response"]
             }
             
-            state_manager.add_message_to_history(session_id, conversation_entry)
-            state_manager.update_session_activity(session_id)
+            await state_manager.add_message_to_history(session_id, conversation_entry)
+            await state_manager.update_session_activity(session_id)
             
             print(f"✓ Message processed and stored in Redis")
         
         # Retrieve conversation history
-        history = state_manager.get_conversation_history(session_id)
+        history = await state_manager.get_conversation_history(session_id)
         if len(history) == len(test_messages):
             print(f"✓ Conversation history complete: {len(history)} messages stored")
         else:
             print(f"⚠ History length mismatch: expected {len(test_messages)}, got {len(history)}")
         
         # Check session stats
-        session_info = state_manager.get_session_info(session_id)
+        session_info = await state_manager.get_session_info(session_id)
         if session_info and session_info["message_count"] >= len(test_messages):
             print(f"✓ Session message count updated: {session_info['message_count']}")
         else:
             print(f"⚠ Session message count issue")
         
         # Cleanup
-        state_manager.clear_conversation_history(session_id)
+        await state_manager.clear_conversation_history(session_id)
         print("✓ Integration test completed and cleaned up")
         
         return True
@@ -398,7 +413,7 @@ def test_integration_with_workflow():
         print(f"✗ Integration test failed: {e}")
         return False
 
-def test_ai_service():
+async def test_ai_service():
     """Test the basic AI service functionality"""
     print("=== Testing AI Service ===")
     
@@ -407,7 +422,7 @@ def test_ai_service():
     
     # Test text generation
     prompt = "What is the capital of France?"
-    response = ai_service.generate_text(prompt, max_tokens=50)
+    response = await ai_service.generate_text(prompt, max_tokens=50)
     
     if response and len(response.strip()) > 0:
         print("✓ Text generation working")
@@ -493,11 +508,13 @@ def test_card_update_functionality():
         print(f"✗ Failed to create test card: {create_response.text}")
         return False
 
-def test_langgraph_workflow():
+async def test_langgraph_workflow():
     """Test the LangGraph workflow with different message types"""
     print("=== Testing LangGraph Workflow ===")
     
     workflow = ConversationalWorkflow()
+    
+    await workflow.init()
     print("✓ ConversationalWorkflow initialized")
     
     if workflow.use_redis:
@@ -532,7 +549,7 @@ def test_langgraph_workflow():
         print(f"Input: '{test['message']}'")
         
         try:
-            result = workflow.process_message(test['message'], session_id=session_id)
+            result = await workflow.process_message(test['message'], session_id=session_id)
             
             # Use the same session for continuity testing
             if not session_id and result.get('session_id'):
@@ -558,14 +575,14 @@ def test_langgraph_workflow():
     # Test session history if Redis is enabled
     if workflow.use_redis and session_id:
         print("Testing conversation history...")
-        history = workflow.get_session_history(session_id)
+        history = await workflow.get_session_history(session_id)
         print(f"✓ Retrieved {len(history)} messages from history")
         for i, msg in enumerate(history[-2:], 1):  # Show last 2 messages
             print(f"  {i}. {msg['user_message']} -> {msg['intent']}")
     
     print("Basic workflow tests completed!\n")
 
-def test_create_workflow():
+async def test_create_workflow():
     """Test the CREATE_NEW workflow specifically"""
     print("=== Testing CREATE_NEW Workflow ===")
     
@@ -576,6 +593,8 @@ def test_create_workflow():
     
     workflow = ConversationalWorkflow()
     
+    await workflow.init()
+    
     # Test create messages
     create_test_cases = [
         "I want to create a card about machine learning fundamentals",
@@ -589,7 +608,7 @@ def test_create_workflow():
         print(f"CREATE Test {i}: '{message}'")
         
         try:
-            result = workflow.process_message(message)
+            result = await workflow.process_message(message)
             
             print(f"✓ Workflow completed")
             print(f"  Intent: {result['intent']} (confidence: {result['confidence']})")
@@ -610,7 +629,7 @@ def test_create_workflow():
     
     print("CREATE_NEW workflow tests completed!\n")
 
-def test_update_workflow():
+async def test_update_workflow():
     """Test the UPDATE workflow specifically"""
     print("=== Testing UPDATE Workflow ===")
     
@@ -621,6 +640,8 @@ def test_update_workflow():
     
     workflow = ConversationalWorkflow()
     
+    await workflow.init()
+    
     # Test update messages
     update_test_cases = [
         "Update my Python card with information about web frameworks",
@@ -634,7 +655,7 @@ def test_update_workflow():
         print(f"UPDATE Test {i}: '{message}'")
         
         try:
-            result = workflow.process_message(message)
+            result = await workflow.process_message(message)
             
             print(f"✓ Workflow completed")
             print(f"  Intent: {result['intent']} (confidence: {result['confidence']})")
@@ -655,12 +676,14 @@ def test_update_workflow():
     
     print("UPDATE workflow tests completed!\n")
 
-def test_workflow_nodes():
+async def test_workflow_nodes():
     """Test individual workflow nodes"""
     print("=== Testing Individual Workflow Nodes ===")
     
     workflow = ConversationalWorkflow()
     
+    await workflow.init()
+    
     # Test state structure
     test_state = {
         "user_message": "What is AI?",
@@ -674,7 +697,7 @@ def test_workflow_nodes():
     
     print("Testing analyze_intent_node...")
     try:
-        updated_state = workflow.analyze_intent_node(test_state.copy())
+        updated_state = await workflow.analyze_intent_node(test_state.copy())
         if updated_state["intent"] and updated_state["confidence"] is not None:
             print("✓ Intent analysis node working")
             print(f"  Intent: {updated_state['intent']}")
@@ -688,7 +711,7 @@ def test_workflow_nodes():
     try:
         # Set intent for response generation
         test_state["intent"] = "NO_ACTION"
-        response_state = workflow.generate_response_node(test_state.copy())
+        response_state = await workflow.generate_response_node(test_state.copy())
         if response_state["response"] and len(response_state["response"].strip()) > 0:
             print("✓ Response generation node working")
             print(f"  Response: {response_state['response'][:100]}...")
@@ -710,7 +733,7 @@ def test_workflow_nodes():
                 "updated_card": None
             }
             
-            update_result_state = workflow.update_card_node(update_test_state)
+            update_result_state = await workflow.update_card_node(update_test_state)
             if update_result_state.get("response"):
                 print("✓ Update card node executed")
                 print(f"  Result: {update_result_state['response'][:100]}...")
@@ -725,46 +748,46 @@ def test_workflow_nodes():
     
     print("Individual node tests completed!\n")
 
-if __name__ == "__main__":
+async def main():
     print("LangGraph Backend - Comprehensive Testing Suite")
     print("=" * 60)
     
     try:
         # Test Redis infrastructure first
-        redis_working = test_redis_connection()
+        redis_working = await test_redis_connection()
         if not redis_working:
             print("\n⚠ Redis tests failed - some functionality will be limited")
         
         # Test AI service
-        test_ai_service()
+        await test_ai_service()
         
         # Test Redis-based components (if Redis is working)
         if redis_working:
-            test_conversation_state_manager()
-            test_session_management()
-            test_redis_ttl_behavior()
-            test_redis_error_handling()
+            await test_conversation_state_manager()
+            await test_session_management()
+            await test_redis_ttl_behavior()
+            await test_redis_error_handling()
         else:
             print("\n⚠ Skipping Redis-dependent tests")
         
         # Test workflow components
-        test_workflow_nodes()
-        test_langgraph_workflow()
+        await test_workflow_nodes()
+        await test_langgraph_workflow()
         
         # Test session continuity (if Redis is working)
         if redis_working:
-            test_session_continuity()
+            await test_session_continuity()
         
         # Test backend integration (if backend is available)
         backend_available = test_backend_connection()
         if backend_available:
             test_card_update_functionality()
-            test_create_workflow()  # Add CREATE_NEW flow test
-            test_update_workflow()
+            await test_create_workflow()  # Add CREATE_NEW flow test
+            await test_update_workflow()
             
             # Test Redis-workflow integration (if both are available)
             if redis_working:
-                test_integration_with_workflow()
+                await test_integration_with_workflow()
         else:
             print("\n⚠ Skipping backend-dependent tests")
         
@@ -799,4 +822,7 @@ if __name__ == "__main__":
         print("\nTroubleshooting:")
         print("- Make sure Redis is running: docker ps | grep redis")
         print("- Make sure backend is running: curl http://localhost:5000/cards")
-        print("- Check AWS credentials are configured for Bedrock")
\ No newline at end of file
+        print("- Check AWS credentials are configured for Bedrock")
+
+if __name__ == "__main__":
+    asyncio.run(main())